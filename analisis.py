@@ -0,0 +1,495 @@
+"""Capa de cálculo del dashboard, sin dependencias de Streamlit.
+
+Cada función recibe DataFrames ya cargados y clasificados y devuelve tablas
+o valores listos para mostrar, de modo que pueden probarse sin interfaz,
+cachearse por versión de datos o ejecutarse en otro proceso.
+"""
+from datetime import date
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_TIMMING = ['Día hábil', 'Fecha', 'Timing', 'Meta día', 'Acumulado']
+# Tablas de la hoja de timming: clave -> título de la celda que la encabeza,
+# y encabezados de sus columnas en la hoja, en el orden de COLUMNAS_TIMMING y
+# normalizados como los entrega carga.leer_bloques (sin tildes, en minúsculas)
+TITULOS_TIMMING = {
+    'GASTOS_GENERAL': 'TIMMING GENERAL GASTOS ADMINISTRATIVOS',
+    'GASTOS_ASESOR': 'TIMMING ASESOR GASTOS',
+    'PLANILLAS_GENERAL': 'TIMMING GENERAL PLANILLAS',
+    'PLANILLAS_ASESOR': 'TIMMING ASESOR PLANILLAS'
+}
+ENCABEZADOS_TIMMING = ['dia habil', 'fecha calendario', 'timing', 'meta dia', 'acumulado']
+
+# ============================================
+# CUBO DE AGREGADOS DE PAGOS
+# ============================================
+def _unir_clientes(conjuntos):
+    return frozenset().union(*conjuntos)
+
+def construir_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega CIERRE DE PAGOS al grano más fino: asesor × cartera × equipo × fecha.
+
+    Cada celda guarda el monto, la cantidad de pagos, de filas y el conjunto de
+    clientes (RAZON_SOCIAL), de modo que las vistas se obtienen sumando y uniendo
+    celdas sin volver a recorrer las filas.
+    """
+    base = df.assign(FECHA=df['FECHA_DE_PAGO'].dt.normalize())
+    return base.groupby(['ASESOR', 'CARTERA', 'EQUIPO', 'FECHA'], observed=True, dropna=False).agg(
+        MONTO=('MONTO', 'sum'),
+        PAGOS=('MONTO', 'count'),
+        FILAS=('MONTO', 'size'),
+        CLIENTES=('RAZON_SOCIAL', lambda x: frozenset(x.dropna()))
+    ).reset_index()
+
+def _unir_categorias(df: pd.DataFrame, otro: pd.DataFrame) -> tuple:
+    """Lleva las columnas categóricas de ambos DataFrames a la unión de sus
+    categorías, para que concat las conserve como categóricas"""
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and isinstance(otro[col].dtype, pd.CategoricalDtype):
+            categorias = df[col].cat.categories.union(otro[col].cat.categories)
+            df = df.assign(**{col: df[col].cat.set_categories(categorias)})
+            otro = otro.assign(**{col: otro[col].cat.set_categories(categorias)})
+    return df, otro
+
+def fusionar_cubos(cubo: pd.DataFrame, cubo_nuevo: pd.DataFrame) -> pd.DataFrame:
+    """Incorpora al cubo las celdas de otro cubo (p. ej. el de los pagos agregados)"""
+    return pd.concat(_unir_categorias(cubo, cubo_nuevo), ignore_index=True).groupby(
+        ['ASESOR', 'CARTERA', 'EQUIPO', 'FECHA'], observed=True, dropna=False
+    ).agg(
+        MONTO=('MONTO', 'sum'),
+        PAGOS=('PAGOS', 'sum'),
+        FILAS=('FILAS', 'sum'),
+        CLIENTES=('CLIENTES', _unir_clientes)
+    ).reset_index()
+
+def agregar_cubo(cubo: pd.DataFrame, claves: list) -> pd.DataFrame:
+    """Agrega el cubo a las claves indicadas: suma montos, pagos y filas, une clientes.
+    Como en un groupby normal, se descartan las celdas con claves nulas."""
+    resumen = cubo.groupby(claves, observed=True).agg(
+        MONTO=('MONTO', 'sum'),
+        PAGOS=('PAGOS', 'sum'),
+        FILAS=('FILAS', 'sum'),
+        CLIENTES=('CLIENTES', _unir_clientes)
+    ).reset_index()
+    resumen['NUM_CLIENTES'] = resumen['CLIENTES'].map(len)
+    return resumen
+
+def categoria_dominante(cubo: pd.DataFrame, claves: list, categoria: str) -> pd.DataFrame:
+    """Valor de `categoria` con más filas dentro de cada grupo de `claves`.
+
+    Se cuentan las filas por par (grupo, categoría) y se toma el idxmax por
+    grupo; como el conteo queda ordenado por categoría, un empate se resuelve
+    con el valor menor, igual que mode()[0].
+    """
+    filas = cubo.groupby(claves + [categoria], observed=True)['FILAS'].sum().reset_index()
+    dominante = filas.groupby(claves, observed=True)['FILAS'].idxmax()
+    return filas.loc[dominante, claves + [categoria]].reset_index(drop=True)
+
+def evolucion_desde_cubo(cubo: pd.DataFrame) -> pd.DataFrame:
+    """Pagos diarios por equipo y su acumulado (MONTO_DIARIO, MONTO_ACUMULADO)"""
+    evolucion = agregar_cubo(cubo, ['FECHA', 'EQUIPO'])[['FECHA', 'EQUIPO', 'MONTO']]
+    evolucion.columns = ['FECHA', 'EQUIPO', 'MONTO_DIARIO']
+    evolucion = evolucion.sort_values('FECHA')
+    evolucion['MONTO_ACUMULADO'] = evolucion.groupby('EQUIPO', observed=True)['MONTO_DIARIO'].cumsum()
+    return evolucion
+
+def actualizar_evolucion(evolucion: pd.DataFrame, cubo_nuevo: pd.DataFrame) -> pd.DataFrame:
+    """Incorpora a la evolución los pagos de un cubo de filas nuevas.
+    Los días anteriores al primer día afectado se conservan tal cual; desde ese
+    día el acumulado continúa a partir del último acumulado de cada equipo."""
+    diario_nuevo = agregar_cubo(cubo_nuevo, ['FECHA', 'EQUIPO'])[['FECHA', 'EQUIPO', 'MONTO']]
+    if diario_nuevo.empty:
+        return evolucion
+    diario_nuevo.columns = ['FECHA', 'EQUIPO', 'MONTO_DIARIO']
+
+    desde = diario_nuevo['FECHA'].min()
+    intactos = evolucion[evolucion['FECHA'] < desde]
+    afectados = pd.concat([evolucion.loc[evolucion['FECHA'] >= desde, ['FECHA', 'EQUIPO', 'MONTO_DIARIO']], diario_nuevo])
+    afectados = afectados.groupby(['FECHA', 'EQUIPO'], observed=True)['MONTO_DIARIO'].sum().reset_index()
+    afectados = afectados.sort_values('FECHA', kind='stable')
+
+    base = intactos.groupby('EQUIPO', observed=True)['MONTO_ACUMULADO'].last().to_dict()
+    afectados['MONTO_ACUMULADO'] = (
+        afectados.groupby('EQUIPO', observed=True)['MONTO_DIARIO'].cumsum()
+        + afectados['EQUIPO'].astype(str).map(base).fillna(0.0)
+    )
+    return pd.concat([intactos, afectados], ignore_index=True)
+
+# ============================================
+# ASESORES, EQUIPOS Y CARTERAS
+# ============================================
+class ResumenEquipo(NamedTuple):
+    monto: float
+    clientes: int
+    asesores: int
+
+def tablas_asesores(cubo: pd.DataFrame) -> tuple:
+    """(df_asesores, df_asesores_simple): monto y clientes por asesor × equipo × cartera,
+    y por asesor × equipo con su cartera dominante.
+
+    Ambas conservan en CLIENTES el conjunto de clientes de cada fila, para que
+    los totales por equipo o cartera cuenten una sola vez a un cliente
+    atendido por varios asesores (unión de conjuntos, no suma de conteos).
+    """
+    df_asesores = agregar_cubo(cubo, ['ASESOR', 'EQUIPO', 'CARTERA'])[
+        ['ASESOR', 'EQUIPO', 'CARTERA', 'MONTO', 'NUM_CLIENTES', 'CLIENTES']
+    ]
+    df_asesores.columns = ['ASESOR', 'EQUIPO', 'CARTERA', 'MONTO_TOTAL', 'NUM_RAZONES_SOCIALES', 'CLIENTES']
+
+    df_asesores_simple = agregar_cubo(cubo, ['ASESOR', 'EQUIPO'])[
+        ['ASESOR', 'EQUIPO', 'MONTO', 'NUM_CLIENTES', 'CLIENTES']
+    ].merge(categoria_dominante(cubo, ['ASESOR', 'EQUIPO'], 'CARTERA'), on=['ASESOR', 'EQUIPO'], how='left')
+    df_asesores_simple.columns = ['ASESOR', 'EQUIPO', 'MONTO_TOTAL', 'NUM_RAZONES_SOCIALES', 'CLIENTES', 'CARTERA']
+    return df_asesores, df_asesores_simple
+
+def resumen_equipo(df_asesores_simple: pd.DataFrame, equipo: str) -> ResumenEquipo:
+    """Monto, clientes distintos y asesores de un equipo"""
+    df_equipo = df_asesores_simple[df_asesores_simple['EQUIPO'] == equipo]
+    return ResumenEquipo(
+        monto=df_equipo['MONTO_TOTAL'].sum(),
+        clientes=len(_unir_clientes(df_equipo['CLIENTES'])),
+        asesores=len(df_equipo)
+    )
+
+def clientes_por_equipo(df_asesores_simple: pd.DataFrame) -> pd.DataFrame:
+    """Clientes distintos por equipo (EQUIPO, NUM_RAZONES_SOCIALES)"""
+    clientes = df_asesores_simple.groupby('EQUIPO', observed=True)['CLIENTES'].agg(_unir_clientes)
+    return clientes.map(len).rename('NUM_RAZONES_SOCIALES').reset_index()
+
+def tabla_jerarquica(df_asesores: pd.DataFrame, mostrar_equipo: bool = False) -> pd.DataFrame:
+    """Tabla con cada cartera como encabezado y sus asesores debajo (por monto).
+
+    Columnas 'Cartera / Asesor', 'Clientes', 'Monto', `_es_header` (filas de
+    cartera) y `_cartera` (cartera de cada fila); los clientes de una cartera
+    son los distintos entre sus asesores. Con `mostrar_equipo` se agrega el
+    equipo junto al nombre del asesor. Se arma con un groupby y un
+    ordenamiento, sin recorrer filas.
+    """
+    carteras = df_asesores.groupby('CARTERA', observed=True).agg(
+        Clientes=('CLIENTES', lambda conjuntos: len(_unir_clientes(conjuntos))),
+        Monto=('MONTO_TOTAL', 'sum')
+    ).reset_index()
+    carteras['Cartera / Asesor'] = '◼ ' + carteras['CARTERA'].astype(str)
+    carteras['_es_header'] = True
+
+    # Asesores bajo cada cartera (pueden repetirse si están en otras carteras)
+    asesores = df_asesores.sort_values(['CARTERA', 'MONTO_TOTAL'], ascending=[True, False], kind='stable')
+    asesores = asesores.rename(columns={'NUM_RAZONES_SOCIALES': 'Clientes', 'MONTO_TOTAL': 'Monto'})
+    if mostrar_equipo:
+        asesores['Cartera / Asesor'] = '    ' + asesores['ASESOR'].astype(str) + ' (' + asesores['EQUIPO'].astype(str) + ')'
+    else:
+        asesores['Cartera / Asesor'] = '  ' + asesores['ASESOR'].astype(str)
+    asesores['_es_header'] = False
+
+    columnas = ['CARTERA', 'Cartera / Asesor', 'Clientes', 'Monto', '_es_header']
+    tabla = pd.concat([carteras[columnas], asesores[columnas]], ignore_index=True)
+    # La fila de cada cartera va antes que sus asesores; el orden por monto se conserva
+    tabla = tabla.sort_values(['CARTERA', '_es_header'], ascending=[True, False], kind='stable')
+    tabla['Clientes'] = tabla['Clientes'].astype(int)
+    return tabla.rename(columns={'CARTERA': '_cartera'}).reset_index(drop=True)
+
+def cartera_por_equipo(cubo: pd.DataFrame) -> pd.DataFrame:
+    """Monto y clientes por cartera y equipo (gráfico de carteras)"""
+    df_cartera = agregar_cubo(cubo, ['CARTERA', 'EQUIPO'])[['CARTERA', 'EQUIPO', 'MONTO', 'NUM_CLIENTES']]
+    df_cartera.columns = ['CARTERA', 'EQUIPO', 'MONTO', 'CLIENTES']
+    return df_cartera
+
+def recaudado_por_equipo(df: pd.DataFrame) -> dict:
+    """Monto recaudado por equipo en CIERRE DE PAGOS"""
+    return df.groupby('EQUIPO', observed=False)['MONTO'].sum().to_dict()
+
+# ============================================
+# GESTIONES: HOY x HOY Y EFECTIVIDAD
+# ============================================
+class MetricasEfectividad(NamedTuple):
+    recaudado: float
+    promesas: float
+    proyectado: float
+    porcentaje_conversion: float
+
+class MatrizHoyXHoy(NamedTuple):
+    celdas: pd.Series           # monto por (FECHA_GESTION, FECHA_PROMESA), solo pares con promesas
+    filas: pd.DatetimeIndex     # fechas de gestión, en orden
+    columnas: pd.DatetimeIndex  # fechas de promesa, en orden
+    total_filas: np.ndarray     # total por fecha de gestión (alineado con filas)
+    total_columnas: np.ndarray  # total por fecha de promesa (alineado con columnas)
+    total: float
+
+def limpiar_gestiones(df_gestiones: pd.DataFrame) -> pd.DataFrame:
+    """Gestiones con fecha de gestión, fecha de promesa y monto prometido positivo"""
+    return df_gestiones[
+        (df_gestiones['FECHA_GESTION'].notna()) &
+        (df_gestiones['FECHA_PROMESA'].notna()) &
+        (df_gestiones['MONTO_PROMESA'].notna()) &
+        (df_gestiones['MONTO_PROMESA'] > 0)
+    ].copy()
+
+def matriz_hoy_x_hoy(df_gestiones_limpio: pd.DataFrame, equipo: Optional[str] = None) -> MatrizHoyXHoy:
+    """Monto prometido por fecha de gestión × fecha de promesa, en forma dispersa.
+
+    Solo se guardan los pares con promesas (una Series con MultiIndex de fechas
+    reales, en orden cronológico); los totales por fila, por columna y general
+    salen de esas celdas, sin materializar la matriz completa. `equipo` None
+    incluye todos.
+    """
+    if equipo is not None:
+        df_gestiones_limpio = df_gestiones_limpio[df_gestiones_limpio['EQUIPO'] == equipo]
+
+    celdas = df_gestiones_limpio.groupby([
+        df_gestiones_limpio['FECHA_GESTION'].dt.normalize(),
+        df_gestiones_limpio['FECHA_PROMESA'].dt.normalize()
+    ])['MONTO_PROMESA'].sum()
+    return matriz_desde_celdas(celdas)
+
+def matriz_desde_celdas(celdas: pd.Series) -> MatrizHoyXHoy:
+    """MatrizHoyXHoy a partir de sus celdas (monto por FECHA_GESTION × FECHA_PROMESA,
+    ordenadas); los totales salen de las celdas"""
+    total_filas = celdas.groupby(level=0).sum()
+    total_columnas = celdas.groupby(level=1).sum()
+    return MatrizHoyXHoy(
+        celdas=celdas,
+        filas=pd.DatetimeIndex(total_filas.index),
+        columnas=pd.DatetimeIndex(total_columnas.index),
+        total_filas=total_filas.to_numpy(),
+        total_columnas=total_columnas.to_numpy(),
+        total=celdas.sum()
+    )
+
+def promesas_por_equipo(df_gestiones_limpio: pd.DataFrame) -> dict:
+    """Monto en promesas por equipo"""
+    return df_gestiones_limpio.groupby('EQUIPO', observed=False)['MONTO_PROMESA'].sum().to_dict()
+
+def metricas_efectividad(recaudado: float, promesas: float) -> MetricasEfectividad:
+    """Recaudado, promesas, total proyectado y % de conversión (recaudado / proyectado)"""
+    proyectado = recaudado + promesas
+    porcentaje = (recaudado / proyectado) * 100 if proyectado > 0 else 0
+    return MetricasEfectividad(recaudado, promesas, proyectado, porcentaje)
+
+# ============================================
+# AVANCE DÍA A DÍA
+# ============================================
+class IndicePorDia(NamedTuple):
+    datos: pd.DataFrame  # filas con fecha ordenadas por FECHA (día), en su orden original dentro del día
+    limites: dict        # día -> (inicio, fin) de sus filas en datos
+
+def indexar_por_dia(df: pd.DataFrame, columna_fecha: str) -> IndicePorDia:
+    """Ordena las filas por día una sola vez y guarda dónde empieza y termina cada día.
+
+    La fecha (ya datetime64) se normaliza aquí (columna FECHA); después, las
+    filas de un día se obtienen con filas_del_dia como un corte posicional,
+    sin volver a recorrer ni comparar la columna.
+    """
+    dias = df[columna_fecha].dt.normalize()
+    con_fecha = dias.notna()
+    datos = df[con_fecha].assign(FECHA=dias[con_fecha]).sort_values('FECHA', kind='stable')
+
+    fechas = datos['FECHA'].to_numpy()
+    cortes = np.flatnonzero(fechas[1:] != fechas[:-1]) + 1
+    inicios = np.r_[0, cortes] if len(fechas) else np.array([], dtype=int)
+    fines = np.r_[cortes, len(fechas)] if len(fechas) else np.array([], dtype=int)
+    limites = {pd.Timestamp(fechas[inicio]): (int(inicio), int(fin)) for inicio, fin in zip(inicios, fines)}
+    return IndicePorDia(datos, limites)
+
+def filas_del_dia(indice: IndicePorDia, fecha: pd.Timestamp) -> pd.DataFrame:
+    """Filas de un día (vacío si no hay)"""
+    inicio, fin = indice.limites.get(pd.Timestamp(fecha).normalize(), (0, 0))
+    return indice.datos.iloc[inicio:fin]
+
+def resumen_dia(cubo: pd.DataFrame, fecha: pd.Timestamp) -> pd.DataFrame:
+    """Monto, pagos y clientes por equipo en un día, de mayor a menor monto"""
+    resumen = agregar_cubo(cubo[cubo['FECHA'] == fecha], ['EQUIPO'])[
+        ['EQUIPO', 'MONTO', 'PAGOS', 'NUM_CLIENTES']
+    ]
+    resumen.columns = ['EQUIPO', 'MONTO_TOTAL', 'CANTIDAD_PAGOS', 'CANTIDAD_CLIENTES']
+    return resumen.sort_values('MONTO_TOTAL', ascending=False)
+
+def gestiones_del_dia(indice_gestiones: IndicePorDia, fecha: pd.Timestamp) -> dict:
+    """Cantidad de gestiones por equipo en un día (índice por FECHA_GESTION)"""
+    return filas_del_dia(indice_gestiones, fecha).groupby('EQUIPO', observed=False).size().to_dict()
+
+def detalle_dia(df_dia: pd.DataFrame) -> pd.DataFrame:
+    """Pagos del día ordenados por equipo y monto (mayor primero)"""
+    return df_dia[[
+        'ASESOR', 'EQUIPO', 'RAZON_SOCIAL', 'CARTERA', 'MONTO', 'NUMERO_FACTURA'
+    ]].sort_values(['EQUIPO', 'MONTO'], ascending=[True, False])
+
+# ============================================
+# TABLAS PAGINADAS
+# ============================================
+class PaginaTabla(NamedTuple):
+    filas: pd.DataFrame
+    pagina: int
+    total_paginas: int
+    total: int
+
+def _contiene(serie: pd.Series, texto: str) -> pd.Series:
+    return serie.astype(str).str.contains(texto, case=False, regex=False, na=False)
+
+def filtrar_detalle(df: pd.DataFrame, texto: str, columnas_busqueda: list,
+                    orden: list, ascendente: list) -> pd.DataFrame:
+    """Filas con `texto` en alguna de `columnas_busqueda` (sin distinguir mayúsculas),
+    ordenadas por `orden`; los nulos van al final"""
+    if texto:
+        coincide = pd.Series(False, index=df.index)
+        for columna in columnas_busqueda:
+            coincide |= _contiene(df[columna], texto)
+        df = df[coincide]
+    return df.sort_values(orden, ascending=ascendente, kind='stable', na_position='last')
+
+def filtrar_jerarquica(tabla: pd.DataFrame, texto: str, orden: str, ascendente: bool) -> pd.DataFrame:
+    """Filtra y ordena una tabla de tabla_jerarquica sin romper los grupos.
+
+    Una cartera cuyo nombre coincide con `texto` se muestra completa; si no,
+    solo sus asesores que coinciden, bajo su fila de cartera (con los totales
+    de toda la cartera). Las carteras se ordenan por la columna `orden` de su
+    fila de cartera; los asesores conservan su orden por monto.
+    """
+    if texto:
+        coincide = _contiene(tabla['Cartera / Asesor'], texto)
+        carteras_completas = tabla.loc[coincide & tabla['_es_header'], '_cartera']
+        carteras_con_asesor = tabla.loc[coincide & ~tabla['_es_header'], '_cartera']
+        tabla = tabla[
+            tabla['_cartera'].isin(carteras_completas) | coincide
+            | (tabla['_es_header'] & tabla['_cartera'].isin(carteras_con_asesor))
+        ]
+
+    cabeceras = tabla[tabla['_es_header']].sort_values(orden, ascending=ascendente, kind='stable')
+    posicion = pd.Series(range(len(cabeceras)), index=cabeceras['_cartera'].values)
+    return tabla.assign(_posicion=tabla['_cartera'].map(posicion)).sort_values(
+        ['_posicion', '_es_header'], ascending=[True, False], kind='stable'
+    ).drop(columns='_posicion')
+
+def pagina_tabla(tabla: pd.DataFrame, pagina: int, por_pagina: int, grupo: Optional[str] = None) -> PaginaTabla:
+    """Filas de la página `pagina` (desde 1, acotada al rango válido).
+
+    Con `grupo` se pagina por grupos completos (p. ej. carteras con sus asesores)
+    en el orden en que aparecen; `total` cuenta filas o grupos según el caso.
+    """
+    grupos = pd.unique(tabla[grupo]) if grupo else None
+    total = len(grupos) if grupo else len(tabla)
+    total_paginas = max(1, -(-total // por_pagina))
+    pagina = min(max(1, int(pagina)), total_paginas)
+    inicio, fin = (pagina - 1) * por_pagina, pagina * por_pagina
+    if grupo:
+        filas = tabla[tabla[grupo].isin(grupos[inicio:fin])]
+    else:
+        filas = tabla.iloc[inicio:fin]
+    return PaginaTabla(filas, pagina, total_paginas, total)
+
+# ============================================
+# TIMMING
+# ============================================
+class AvanceTimming(NamedTuple):
+    datos: pd.DataFrame
+    fila_hoy: Optional[int]
+    acumulado_hoy: float
+    meta_acumulada_hoy: float
+
+class TablaTimming(NamedTuple):
+    datos: pd.DataFrame          # tabla tipada, en el orden de la hoja
+    filas_por_fecha: pd.Series   # fecha -> posición de su primera fila
+    curva: pd.Series             # fecha -> Acumulado, en el orden de la hoja
+    en_orden: bool               # True si las fechas de la hoja siempre avanzan
+
+class TablasTimming(NamedTuple):
+    tablas: dict      # clave -> DataFrame con COLUMNAS_TIMMING (None si falta o no es válida)
+    problemas: list   # avisos para el usuario sobre bloques ausentes o datos dudosos
+
+def tabla_timming(encabezado: tuple, filas: list) -> tuple:
+    """Valida y tipa un bloque de timming leído de la hoja (encabezado normalizado).
+    Devuelve (DataFrame o None si el bloque no es utilizable, problemas)"""
+    if list(encabezado) != ENCABEZADOS_TIMMING:
+        return None, [f"encabezados inesperados ({', '.join(map(str, encabezado))})"]
+    if not filas:
+        return None, ["no tiene filas de datos"]
+
+    datos = pd.DataFrame(filas, columns=COLUMNAS_TIMMING)
+    datos['Fecha'] = pd.to_datetime(datos['Fecha'], errors='coerce')
+    for columna in ['Día hábil', 'Timing', 'Meta día', 'Acumulado']:
+        datos[columna] = pd.to_numeric(datos[columna], errors='coerce')
+    invalidas = [col for col in COLUMNAS_TIMMING if datos[col].isna().any()]
+    if invalidas:
+        return None, [f"valores vacíos o no válidos en {', '.join(invalidas)}"]
+    datos['Día hábil'] = datos['Día hábil'].astype('int64')
+
+    problemas = []
+    if not datos['Día hábil'].equals(pd.Series(range(1, len(datos) + 1), dtype='int64')):
+        problemas.append("los días hábiles no van de 1 en 1")
+    retrocesos = datos.loc[datos['Fecha'].diff() <= pd.Timedelta(0), 'Día hábil']
+    if len(retrocesos):
+        problemas.append(f"fechas fuera de orden desde el día hábil {retrocesos.iloc[0]}")
+    return datos, problemas
+
+def tablas_timming(bloques: dict) -> TablasTimming:
+    """Arma las 4 tablas de timming a partir de los bloques leídos de la hoja
+    (título -> (encabezado, filas), como los devuelve carga.leer_bloques)"""
+    tablas = {}
+    problemas = []
+    for clave, titulo in TITULOS_TIMMING.items():
+        if titulo not in bloques:
+            tablas[clave] = None
+            problemas.append(f"{titulo}: no se encontró en la hoja")
+            continue
+        tablas[clave], avisos = tabla_timming(*bloques[titulo])
+        problemas.extend(f"{titulo}: {aviso}" for aviso in avisos)
+    return TablasTimming(tablas, problemas)
+
+def preparar_timming(datos: pd.DataFrame) -> TablaTimming:
+    """Normaliza una tabla de timming una sola vez: tipos, posición de cada
+    fecha y curva de acumulado (en el orden de la hoja) para consultar cualquier día"""
+    datos = datos.copy()
+    for columna in ['Día hábil', 'Timing', 'Meta día', 'Acumulado']:
+        datos[columna] = pd.to_numeric(datos[columna], errors='coerce')
+    datos['Fecha'] = pd.to_datetime(datos['Fecha'], errors='coerce').astype('datetime64[ns]')
+    datos = datos.reset_index(drop=True)
+
+    con_fecha = datos.dropna(subset=['Fecha'])
+    filas_por_fecha = pd.Series(con_fecha.index, index=con_fecha['Fecha'])
+    filas_por_fecha = filas_por_fecha[~filas_por_fecha.index.duplicated()]
+    curva = pd.Series(con_fecha['Acumulado'].fillna(0).to_numpy(dtype=float), index=con_fecha['Fecha'])
+    en_orden = len(con_fecha) == len(datos) and curva.index.is_monotonic_increasing and curva.index.is_unique
+    return TablaTimming(datos, filas_por_fecha, curva, en_orden)
+
+def avance_timming(tabla: TablaTimming, hoy: Optional[date] = None) -> AvanceTimming:
+    """Fila de `hoy` (por defecto la fecha del sistema) con su acumulado y meta
+    del día. Un día sin fila (feriado o fin de semana) dentro del rango de la
+    tabla toma el acumulado interpolado entre los días hábiles vecinos, sin
+    meta del día; fuera del rango, o si la hoja tiene fechas fuera de orden
+    (p. ej. un año mal tipeado), no hay acumulado."""
+    hoy = pd.Timestamp(hoy or date.today()).normalize()
+    datos, filas_por_fecha, curva, en_orden = tabla
+
+    fila_hoy = filas_por_fecha.get(hoy)
+    if fila_hoy is not None:
+        fila = datos.loc[fila_hoy]
+        acumulado_hoy = fila['Acumulado'] if pd.notna(fila['Acumulado']) else 0
+        meta_acumulada_hoy = fila['Meta día'] if pd.notna(fila['Meta día']) else 0
+        return AvanceTimming(datos, int(fila_hoy), acumulado_hoy, meta_acumulada_hoy)
+
+    # Solo se interpola entre dos filas consecutivas de la hoja con fecha_i < hoy < fecha_i+1
+    siguiente = curva.index.searchsorted(hoy) if en_orden else 0
+    if not 0 < siguiente < len(curva):
+        return AvanceTimming(datos, None, 0, 0)
+    tramo = curva.iloc[siguiente - 1:siguiente + 1]
+    acumulado_hoy = float(np.interp(hoy.value, tramo.index.asi8, tramo.to_numpy()))
+    return AvanceTimming(datos, None, acumulado_hoy, 0)
+
+def avance_asesores(df: pd.DataFrame, asesores: list, tabla: TablaTimming,
+                    hoy: Optional[date] = None) -> pd.DataFrame:
+    """Recaudado, acumulado esperado a `hoy`, diferencia y % de avance de todos
+    los `asesores` a la vez: una sola agrupación de CIERRE DE PAGOS unida al
+    acumulado de la tabla de timming por asesor (la misma meta para todos).
+    Los asesores sin pagos quedan con 0; el % es nulo si no hay acumulado a hoy."""
+    acumulado_hoy = float(avance_timming(tabla, hoy).acumulado_hoy)
+    recaudado = df.loc[df['ASESOR'].isin(asesores)].groupby('ASESOR', observed=True)['MONTO'].sum()
+    recaudado.index = recaudado.index.astype(object)
+    resultado = pd.DataFrame({
+        'ASESOR': list(asesores),
+        'RECAUDADO': recaudado.reindex(list(asesores), fill_value=0).to_numpy(dtype=float)
+    })
+    resultado['META_HOY'] = acumulado_hoy
+    resultado['DIFERENCIA'] = resultado['META_HOY'] - resultado['RECAUDADO']
+    resultado['AVANCE'] = resultado['RECAUDADO'] / acumulado_hoy * 100 if acumulado_hoy > 0 else np.nan
+    return resultado
@@ -0,0 +1,614 @@
+import os
+import glob
+import json
+import hashlib
+import unicodedata
+import multiprocessing
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:
+    pa = None
+
+# Carpeta (junto al libro) donde se guardan las instantáneas columnar de cada hoja
+CARPETA_SNAPSHOTS = '_snapshots'
+
+# Ingesta por streaming de GESTIONES: solo las columnas que usa el dashboard,
+# con su tipo, descartando durante la lectura las filas sin FECHA_GESTION
+COLUMNAS_GESTIONES = {
+    'GESTOR': 'texto',
+    'FECHA_GESTION': 'fecha',
+    'FECHA_PROMESA': 'fecha',
+    'MONTO_PROMESA': 'numero'
+}
+STREAMING_GESTIONES = {'GESTIONES': (COLUMNAS_GESTIONES, ('FECHA_GESTION',))}
+
+# Filas que se acumulan como listas de Python antes de convertirlas a columnas tipadas
+TAMANO_BLOQUE = 10000
+
+# Hojas que solo crecen al final: (columna clave de la última fila, columna de fecha marca de agua)
+INCREMENTAL_CIERRE = {'CIERRE DE PAGOS': ('NUMERO_FACTURA', 'FECHA_DE_PAGO')}
+
+# Archivos de una sola hoja (junto al libro combinado) que pueden reemplazar
+# a la hoja del mismo nombre del libro; ver resolver_fuentes
+ARCHIVOS_POR_HOJA = {
+    'CIERRE DE PAGOS': 'CIERRE DE PAGOS.xlsx',
+    'GESTIONES': 'GESTIONES.xlsx'
+}
+
+# Lectura en paralelo: por debajo de este tamaño total de libros por leer
+# (en bytes) arrancar procesos cuesta más de lo que se gana
+TAMANO_MINIMO_PARALELO = 1024 * 1024
+
+# Tipos de las columnas que usa el dashboard, aplicados una sola vez al leer:
+# los textos repetidos (asesores, carteras, clientes) como categorías, las
+# fechas como datetime64 y los montos como float
+ESQUEMAS_ANALISIS = {
+    'CIERRE DE PAGOS': {
+        'ASESOR': 'categoria',
+        'CARTERA': 'categoria',
+        'RAZON_SOCIAL': 'categoria',
+        'FECHA_DE_PAGO': 'fecha',
+        'MONTO': 'numero'
+    },
+    'GESTIONES': {
+        'GESTOR': 'categoria',
+        'FECHA_GESTION': 'fecha',
+        'FECHA_PROMESA': 'fecha',
+        'MONTO_PROMESA': 'numero'
+    }
+}
+
+def huella_archivo(ruta):
+    """Identifica la versión de un archivo por ruta absoluta, fecha de modificación y tamaño"""
+    info = os.stat(ruta)
+    return (os.path.abspath(ruta), info.st_mtime_ns, info.st_size)
+
+def ruta_snapshot(ruta_excel, hoja, variante=None):
+    """Ruta de la instantánea Arrow/Feather de una hoja, junto al libro de origen.
+    `variante` distingue instantáneas parciales (p. ej. solo algunas columnas)."""
+    carpeta = os.path.join(os.path.dirname(os.path.abspath(ruta_excel)), CARPETA_SNAPSHOTS)
+    nombre_libro = os.path.splitext(os.path.basename(ruta_excel))[0]
+    sufijo = f" [{variante}]" if variante else ""
+    return os.path.join(carpeta, f"{nombre_libro} - {hoja}{sufijo}.feather")
+
+def variante_streaming(tipos, obligatorias):
+    """Identificador corto de una selección de columnas y filtros de streaming"""
+    firma = repr((sorted(tipos.items()), tuple(obligatorias)))
+    return hashlib.md5(firma.encode('utf-8')).hexdigest()[:8]
+
+def _huella_libro(ruta_excel):
+    """(mtime_ns, tamaño) del libro como se guarda en el esquema de sus instantáneas"""
+    return list(huella_archivo(ruta_excel)[1:])
+
+def snapshot_vigente(ruta_excel, hoja, variante=None):
+    """True si existe una instantánea de la hoja hecha desde esta misma versión
+    del libro: su huella debe coincidir exactamente (una copia que conserva
+    una fecha de modificación anterior no pasa por vigente)"""
+    ruta_snap = ruta_snapshot(ruta_excel, hoja, variante)
+    if not os.path.isfile(ruta_snap):
+        return False
+    try:
+        with pa.memory_map(ruta_snap) as fuente:
+            libro = (pa.ipc.open_file(fuente).schema.metadata or {}).get(b'libro')
+        return libro is not None and json.loads(libro) == _huella_libro(ruta_excel)
+    except (OSError, ValueError, pa.ArrowException):
+        return False
+
+def _columnas_arrow(df):
+    """Prepara el DataFrame para Arrow: nombres de columna como texto y
+    columnas con tipos mezclados (número y texto en la misma columna) como texto"""
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda x: x if pd.isna(x) else str(x), na_action='ignore')
+    return df
+
+def guardar_snapshot(df, ruta_excel, hoja, variante=None, metadatos=None, huella=None):
+    """Escribe la instantánea (ya preparada con _columnas_arrow) sin comprimir,
+    para poder mapearla en memoria. El esquema Arrow guarda la huella del
+    libro leído (`huella`, tomada antes de abrirlo; por defecto la actual) y
+    `metadatos`. Se escribe a un temporal y se reemplaza, así un lector nunca
+    ve un archivo a medias."""
+    ruta_snap = ruta_snapshot(ruta_excel, hoja, variante)
+    os.makedirs(os.path.dirname(ruta_snap), exist_ok=True)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    esquema = dict(tabla.schema.metadata or {})
+    esquema[b'libro'] = json.dumps(huella or _huella_libro(ruta_excel)).encode('utf-8')
+    if metadatos is not None:
+        esquema[b'incremental'] = json.dumps(metadatos).encode('utf-8')
+    tabla = tabla.replace_schema_metadata(esquema)
+    temporal = ruta_snap + '.tmp'
+    feather.write_feather(tabla, temporal, compression='uncompressed')
+    os.replace(temporal, ruta_snap)
+
+def leer_snapshot(ruta_excel, hoja, header=0, variante=None):
+    """Lee la instantánea de una hoja mapeando el archivo en memoria"""
+    tabla = feather.read_table(ruta_snapshot(ruta_excel, hoja, variante), memory_map=True)
+    df = tabla.to_pandas()
+    if header is None:
+        # Sin encabezado, read_excel numera las columnas 0..n-1
+        df.columns = range(len(df.columns))
+    return df
+
+def _clave_texto(valor):
+    """Clave comparable entre pandas y openpyxl (1.0 y 1 son la misma clave, NaN y None también)"""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+def huella_filas(filas):
+    """Huella de los valores de una secuencia de filas (tuplas), igual para las
+    filas de un DataFrame y las de openpyxl con los mismos datos (ver _clave_texto)"""
+    huella = hashlib.sha1()
+    for fila in filas:
+        huella.update('\x1f'.join('\x00' if texto is None else texto for texto in map(_clave_texto, fila)).encode())
+        huella.update(b'\x1e')
+    return huella.hexdigest()
+
+def _marca_fecha(fechas):
+    marca = pd.to_datetime(pd.Series(fechas, dtype=object), errors='coerce').max() if len(fechas) else pd.NaT
+    return None if pd.isna(marca) else marca.isoformat()
+
+def metadatos_incrementales(df, clave, columna_fecha):
+    """Marca de agua de una hoja que solo crece: filas, clave de la última fila,
+    fecha máxima y huella de todas las filas"""
+    return {
+        'filas': len(df),
+        'columnas': [str(col) for col in df.columns],
+        'ultima_clave': _clave_texto(df[clave].iloc[-1]) if len(df) else None,
+        'marca_fecha': _marca_fecha(df[columna_fecha].tolist()),
+        'huella_filas': huella_filas(df.itertuples(index=False, name=None))
+    }
+
+def _leer_agregadas(hoja_xl, ruta_excel, hoja, clave, columna_fecha, huella=None):
+    """Lee solo las filas agregadas al final de una hoja desde la última instantánea.
+
+    Antes de usar la instantánea comprueba que la hoja conserve los
+    encabezados y que las filas ya conocidas no hayan cambiado: misma clave
+    en la última, misma fecha máxima y misma huella de valores (una edición
+    en cualquier fila previa la cambia). Si algo difiere, o si el libro
+    cambió sin agregar filas, devuelve None para que la hoja se relea
+    completa. Las filas nuevas se convierten y se unen a la instantánea
+    previa, que se reescribe con la nueva marca de agua. El DataFrame
+    devuelto lleva en attrs['filas_previas'] cuántas filas ya estaban en la
+    instantánea.
+    """
+    ruta_snap = ruta_snapshot(ruta_excel, hoja)
+    if not os.path.isfile(ruta_snap):
+        return None
+    tabla = feather.read_table(ruta_snap, memory_map=True)
+    meta = (tabla.schema.metadata or {}).get(b'incremental')
+    if meta is None:
+        return None
+    meta = json.loads(meta)
+    if 'huella_filas' not in meta:
+        return None  # Instantánea de una versión anterior, sin huella
+
+    encabezado = next(hoja_xl.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    encabezado = [str(col) for col in encabezado]
+    if encabezado != meta['columnas']:
+        return None
+    pos_clave = encabezado.index(clave)
+    pos_fecha = encabezado.index(columna_fecha)
+
+    # Las filas ya conocidas solo se recorren para verificarlas; las nuevas se guardan
+    filas_previas = meta['filas']
+    previas_hoja = []
+    nuevas = []
+    for fila in hoja_xl.iter_rows(min_row=2, values_only=True):
+        if len(previas_hoja) < filas_previas:
+            previas_hoja.append(fila)
+        else:
+            nuevas.append(fila)
+    while nuevas and all(valor is None for valor in nuevas[-1]):
+        nuevas.pop()  # read_excel también descarta las filas vacías del final
+    if len(previas_hoja) < filas_previas or not nuevas:
+        return None  # La hoja se acortó o se editó sin crecer
+    if filas_previas and (
+        _clave_texto(previas_hoja[-1][pos_clave]) != meta['ultima_clave']
+        or _marca_fecha([fila[pos_fecha] for fila in previas_hoja]) != meta['marca_fecha']
+        or huella_filas(previas_hoja) != meta['huella_filas']
+    ):
+        return None  # Alguna fila previa cambió
+
+    previas = tabla.to_pandas()
+    df = pd.concat([previas, pd.DataFrame(nuevas, columns=previas.columns)], ignore_index=True)
+    # Una columna vacía en las filas previas toma ahora el tipo de las nuevas
+    df = _columnas_arrow(df.infer_objects())
+    try:
+        guardar_snapshot(df, ruta_excel, hoja, metadatos=metadatos_incrementales(df, clave, columna_fecha),
+                         huella=huella)
+    except (OSError, pa.ArrowException):
+        pass  # Sin permisos de escritura: la próxima carga volverá a leer las filas nuevas
+    df.attrs['filas_previas'] = filas_previas
+    return df
+
+def convertir_columna(serie, tipo):
+    """Convierte una columna a su tipo: 'fecha', 'numero', 'categoria' o 'texto' (sin cambios)"""
+    if tipo == 'fecha':
+        return pd.to_datetime(serie, errors='coerce')
+    if tipo == 'numero':
+        return pd.to_numeric(serie, errors='coerce').astype(float)
+    if tipo == 'categoria':
+        return serie.astype('category')
+    return serie
+
+def normalizar_tipos(df, esquema):
+    """Aplica un esquema columna -> tipo (ver convertir_columna); las columnas
+    que no están en df se ignoran y los attrs se conservan"""
+    columnas = {col: convertir_columna(df[col], tipo) for col, tipo in esquema.items() if col in df.columns}
+    resultado = df.assign(**columnas)
+    resultado.attrs = dict(df.attrs)
+    return resultado
+
+def _bloque_tipado(valores, tipos):
+    """Convierte un bloque de listas de Python en un DataFrame con columnas tipadas"""
+    return pd.DataFrame({col: convertir_columna(pd.Series(valores[col], dtype=object), tipo)
+                         for col, tipo in tipos.items()})
+
+def leer_hoja_streaming(hoja_xl, tipos, obligatorias=(), tamano_bloque=TAMANO_BLOQUE):
+    """Lee una hoja de openpyxl (modo solo lectura) fila a fila.
+
+    Solo extrae las columnas de `tipos`, descarta sobre la marcha las filas
+    con alguna columna de `obligatorias` vacía y convierte a columnas tipadas
+    cada `tamano_bloque` filas, de modo que nunca se materializa la hoja
+    completa como objetos de Python.
+    """
+    encabezado = next(hoja_xl.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    encabezado = [str(col).strip() if col is not None else None for col in encabezado]
+    faltantes = [col for col in tipos if col not in encabezado]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en la hoja {hoja_xl.title}: {', '.join(faltantes)}")
+
+    # Posiciones relativas al rango mínimo de columnas que hay que recorrer
+    indices = {col: encabezado.index(col) for col in tipos}
+    primera, ultima = min(indices.values()), max(indices.values())
+    posiciones = {col: idx - primera for col, idx in indices.items()}
+    pos_obligatorias = [posiciones[col] for col in obligatorias]
+
+    bloques = []
+    valores = {col: [] for col in tipos}
+    filas_bloque = 0
+    for fila in hoja_xl.iter_rows(min_row=2, min_col=primera + 1, max_col=ultima + 1, values_only=True):
+        if any(fila[pos] is None for pos in pos_obligatorias):
+            continue
+        for col, pos in posiciones.items():
+            valores[col].append(fila[pos])
+        filas_bloque += 1
+        if filas_bloque >= tamano_bloque:
+            bloques.append(_bloque_tipado(valores, tipos))
+            valores = {col: [] for col in tipos}
+            filas_bloque = 0
+    if filas_bloque or not bloques:
+        bloques.append(_bloque_tipado(valores, tipos))
+
+    df = pd.concat(bloques, ignore_index=True)
+    # Un texto no convertible en una columna obligatoria de fecha/número queda nulo
+    return df.dropna(subset=list(obligatorias)).reset_index(drop=True)
+
+def _normalizar_y_guardar(df, ruta_excel, hoja, header, variante=None, incremental=None, huella=None):
+    """Normaliza una hoja recién leída del Excel y regenera su instantánea.
+    Se devuelve ya normalizada para que la primera carga y las siguientes
+    (desde la instantánea) entreguen los mismos tipos."""
+    df = _columnas_arrow(df)
+    metadatos = metadatos_incrementales(df, *incremental) if incremental else None
+    try:
+        guardar_snapshot(df, ruta_excel, hoja, variante, metadatos, huella)
+    except (OSError, pa.ArrowException):
+        pass  # Sin permisos de escritura: se sigue con los datos del Excel
+    if header is None:
+        df.columns = range(len(df.columns))
+    return df
+
+def leer_libro(ruta_excel, hojas, header=0, streaming=None, incrementales=None, esquemas=None):
+    """Lee varias hojas de un libro abriéndolo una sola vez.
+
+    Las hojas con instantánea vigente se leen de ella; el resto se leen
+    juntas en una única apertura del libro (openpyxl en modo solo lectura).
+    `streaming` asocia hojas a (tipos, obligatorias): esas hojas se leen con
+    leer_hoja_streaming en lugar de cargarse completas con pandas.
+    `incrementales` asocia hojas que solo crecen a (clave, columna_fecha):
+    si su instantánea quedó atrás, se leen solo las filas agregadas.
+    `esquemas` asocia hojas a un esquema de normalizar_tipos, que se aplica
+    al resultado (las instantáneas guardan los datos sin normalizar).
+    Devuelve un dict hoja -> DataFrame; las hojas que no existen en el
+    libro no aparecen en el resultado.
+    """
+    streaming = streaming or {}
+    incrementales = incrementales or {}
+    resultado = {}
+    pendientes = []
+    for hoja in hojas:
+        variante = variante_streaming(*streaming[hoja]) if hoja in streaming else None
+        if pa is not None and snapshot_vigente(ruta_excel, hoja, variante):
+            try:
+                resultado[hoja] = leer_snapshot(ruta_excel, hoja, header, variante)
+                continue
+            except (OSError, pa.ArrowException):
+                pass  # Instantánea corrupta: se regenera desde el Excel
+        pendientes.append((hoja, variante))
+
+    if pendientes:
+        # La huella se toma antes de abrir el libro: si cambia durante la
+        # lectura, la instantánea no coincidirá y se volverá a leer
+        huella = _huella_libro(ruta_excel)
+        with pd.ExcelFile(ruta_excel, engine='openpyxl') as libro:
+            for hoja, variante in pendientes:
+                if hoja not in libro.sheet_names:
+                    continue
+                if hoja in incrementales and header == 0 and variante is None and pa is not None:
+                    try:
+                        df = _leer_agregadas(libro.book[hoja], ruta_excel, hoja, *incrementales[hoja], huella)
+                    except (OSError, ValueError, KeyError, pa.ArrowException):
+                        df = None  # Marca de agua ilegible: se relee la hoja completa
+                    if df is not None:
+                        resultado[hoja] = df
+                        continue
+                if hoja in streaming:
+                    tipos, obligatorias = streaming[hoja]
+                    df = leer_hoja_streaming(libro.book[hoja], tipos, obligatorias)
+                else:
+                    df = libro.parse(hoja, header=header)
+                if pa is not None:
+                    df = _normalizar_y_guardar(df, ruta_excel, hoja, header, variante, incrementales.get(hoja),
+                                               huella)
+                resultado[hoja] = df
+
+    for hoja, esquema in (esquemas or {}).items():
+        if hoja in resultado:
+            resultado[hoja] = normalizar_tipos(resultado[hoja], esquema)
+    return resultado
+
+def _leer_hoja(ruta_excel, hoja, opciones):
+    return leer_libro(ruta_excel, [hoja], **opciones)
+
+def _hoja_vigente(ruta_excel, hoja, opciones):
+    """True si la hoja se leerá de su instantánea (sin abrir el libro)"""
+    streaming = opciones.get('streaming') or {}
+    variante = variante_streaming(*streaming[hoja]) if hoja in streaming else None
+    return pa is not None and snapshot_vigente(ruta_excel, hoja, variante)
+
+def _nucleos_disponibles():
+    """Núcleos que este proceso puede usar (respeta la afinidad de CPU donde existe)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def leer_libros(lecturas, procesos=None):
+    """Lee hojas de varios libros repartiéndolas en procesos.
+
+    `lecturas` es una lista de (ruta_excel, hojas, opciones), donde opciones
+    son los argumentos con nombre de leer_libro. Cada hoja que hay que leer
+    del Excel va a un proceso distinto (openpyxl usa la CPU todo el tiempo,
+    así que con hilos no avanzarían a la vez); las que tienen instantánea
+    vigente se leen aquí mismo. Con una sola hoja por leer, un solo núcleo,
+    libros pequeños o si el pool no puede crearse, todo se lee en este proceso.
+    Devuelve una lista alineada con `lecturas` de dicts hoja -> DataFrame.
+    """
+    resultados = [{} for _ in lecturas]
+    tareas = [(i, ruta_excel, hoja, opciones)
+              for i, (ruta_excel, hojas, opciones) in enumerate(lecturas) for hoja in hojas]
+    paralelas = [tarea for tarea in tareas if not _hoja_vigente(*tarea[1:])]
+    procesos = min(len(paralelas), procesos or _nucleos_disponibles())
+    tamano = sum(os.path.getsize(ruta) for ruta in {tarea[1] for tarea in paralelas})
+    if procesos < 2 or tamano < TAMANO_MINIMO_PARALELO:
+        paralelas = []
+    locales = [tarea for tarea in tareas if tarea not in paralelas]
+
+    if paralelas:
+        try:
+            # spawn: el proceso del dashboard tiene hilos, y fork con hilos puede bloquearse
+            with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futuros = [(tarea[0], pool.submit(_leer_hoja, *tarea[1:])) for tarea in paralelas]
+                for i, ruta_excel, hoja, opciones in locales:
+                    resultados[i].update(_leer_hoja(ruta_excel, hoja, opciones))
+                locales = []
+                for i, futuro in futuros:
+                    resultados[i].update(futuro.result())
+            paralelas = []
+        except (OSError, BrokenProcessPool):
+            pass  # Sin procesos disponibles (o uno se cayó): se lee todo aquí
+
+    for i, ruta_excel, hoja, opciones in locales + paralelas:
+        resultados[i].update(_leer_hoja(ruta_excel, hoja, opciones))
+    return resultados
+
+# ============================================
+# RESOLUCIÓN DE FUENTES
+# ============================================
+class Fuente(NamedTuple):
+    ruta: str          # archivo del que se lee la hoja
+    hoja: str          # nombre de la hoja dentro de ese archivo
+    tipo: str          # 'libro combinado' o 'archivo por hoja'
+    instantanea: bool  # True si se leerá de su instantánea vigente
+
+_NS_LIBRO = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_RELACION = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PAQUETE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+def tamanos_hojas(ruta_excel):
+    """Hojas del libro con el tamaño (sin comprimir) de su XML, leyendo solo el
+    índice del .xlsx, sin cargarlo con openpyxl"""
+    with zipfile.ZipFile(ruta_excel) as paquete:
+        libro = ET.fromstring(paquete.read('xl/workbook.xml'))
+        relaciones = ET.fromstring(paquete.read('xl/_rels/workbook.xml.rels'))
+        destinos = {rel.get('Id'): rel.get('Target') for rel in relaciones.iter(f'{_NS_PAQUETE}Relationship')}
+        tamanos = {}
+        for hoja in libro.iter(f'{_NS_LIBRO}sheet'):
+            destino = destinos[hoja.get(f'{_NS_RELACION}id')]
+            parte = destino.lstrip('/') if destino.startswith('/') else 'xl/' + destino
+            tamanos[hoja.get('name')] = paquete.getinfo(parte).file_size
+    return tamanos
+
+def hoja_principal(ruta_excel, hoja):
+    """Hoja con los datos de un archivo por hoja: la que se llama `hoja` o,
+    si no hay, la más grande (las exportaciones suelen traer hojas vacías)"""
+    tamanos = tamanos_hojas(ruta_excel)
+    if hoja in tamanos:
+        return hoja
+    return max(tamanos, key=tamanos.get) if tamanos else None
+
+def resolver_fuentes(ruta_libro, hojas, streaming=None):
+    """Elige de dónde leer cada hoja: del libro combinado o de su archivo propio
+    (ARCHIVOS_POR_HOJA, en la misma carpeta).
+
+    Solo compiten las fuentes al día, es decir tan recientes como la más
+    reciente de esa hoja: un archivo por hoja más viejo que el libro no se
+    usa, ni el libro si el archivo propio es más nuevo. Entre ellas se
+    prefiere la que tiene instantánea vigente (no hay que parsear nada) y
+    luego el archivo más chico. Devuelve un dict hoja -> Fuente, con rutas absolutas.
+    """
+    streaming = streaming or {}
+    ruta_libro = os.path.abspath(ruta_libro)
+    carpeta = os.path.dirname(ruta_libro)
+    fuentes = {}
+    for hoja in hojas:
+        variante = variante_streaming(*streaming[hoja]) if hoja in streaming else None
+        candidatas = [(ruta_libro, hoja, 'libro combinado')]
+        ruta_propia = os.path.join(carpeta, ARCHIVOS_POR_HOJA[hoja]) if hoja in ARCHIVOS_POR_HOJA else None
+        if ruta_propia and os.path.isfile(ruta_propia):
+            try:
+                hoja_propia = hoja_principal(ruta_propia, hoja)
+            except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError):
+                hoja_propia = None  # No es un .xlsx legible: queda el libro combinado
+            if hoja_propia is not None:
+                candidatas.append((ruta_propia, hoja_propia, 'archivo por hoja'))
+
+        info = {ruta: os.stat(ruta) for ruta, _, _ in candidatas}
+        reciente = max(estado.st_mtime_ns for estado in info.values())
+        al_dia = [
+            Fuente(ruta, hoja_archivo, tipo, pa is not None and snapshot_vigente(ruta, hoja_archivo, variante))
+            for ruta, hoja_archivo, tipo in candidatas if info[ruta].st_mtime_ns >= reciente
+        ]
+        fuentes[hoja] = min(al_dia, key=lambda fuente: (not fuente.instantanea, info[fuente.ruta].st_size))
+    return fuentes
+
+def opciones_fuente(fuente, hoja, header=0, streaming=None, incrementales=None, esquemas=None):
+    """Argumentos de leer_libro para leer `hoja` desde `fuente`: las opciones
+    por hoja pasan a usar el nombre de la hoja dentro de ese archivo"""
+    def por_hoja(opciones):
+        return {fuente.hoja: opciones[hoja]} if opciones and hoja in opciones else None
+    return {
+        'header': header,
+        'streaming': por_hoja(streaming),
+        'incrementales': por_hoja(incrementales),
+        'esquemas': por_hoja(esquemas)
+    }
+
+def describir_fuente(fuente):
+    """Texto corto de la fuente para mostrar al usuario"""
+    nombre = os.path.basename(fuente.ruta)
+    if fuente.hoja != os.path.splitext(nombre)[0]:
+        nombre = f"{nombre} › {fuente.hoja}"
+    return f"{nombre} ({'instantánea' if fuente.instantanea else fuente.tipo})"
+
+# ============================================
+# BLOQUES ETIQUETADOS (TIMMING)
+# ============================================
+def normalizar_etiqueta(texto):
+    """Etiqueta comparable: sin tildes, sin espacios sobrantes y en minúsculas"""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).split()).casefold()
+
+def _es_numero(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool)
+
+def hoja_timming(hojas, preferida=None):
+    """Hoja de timming del libro: `preferida` si existe o, si no, la última
+    cuyo nombre empieza con 'TIMMING' (cada mes se agrega una nueva); None si no hay"""
+    if preferida in hojas:
+        return preferida
+    candidatas = [hoja for hoja in hojas if normalizar_etiqueta(hoja).startswith('timming')]
+    return candidatas[-1] if candidatas else None
+
+def leer_bloques(hoja_xl, titulos, ancho):
+    """Lee de una hoja de openpyxl (modo solo lectura) las tablas que empiezan
+    con una celda de título.
+
+    Cada tabla ocupa `ancho` columnas desde su título: la fila siguiente es el
+    encabezado (se devuelve con normalizar_etiqueta) y los datos siguen
+    mientras la primera columna sea un número. Solo se guardan esas celdas,
+    y se deja de recorrer la hoja en cuanto terminan todas las tablas. Devuelve un dict título -> (encabezado, filas)
+    con los títulos encontrados, cada fila como tupla de `ancho` valores.
+    """
+    buscados = {normalizar_etiqueta(titulo): titulo for titulo in titulos}
+    ubicados = {}  # título -> (fila del título, columna)
+    bloques = {}
+    abiertos = set()
+    for num_fila, fila in enumerate(hoja_xl.iter_rows(values_only=True)):
+        for titulo in list(abiertos):
+            fila_titulo, columna = ubicados[titulo]
+            celdas = tuple(fila[columna:columna + ancho])
+            celdas += (None,) * (ancho - len(celdas))
+            if num_fila == fila_titulo + 1:
+                bloques[titulo] = (tuple(normalizar_etiqueta(c) if c is not None else '' for c in celdas), [])
+            elif _es_numero(celdas[0]):
+                bloques[titulo][1].append(celdas)
+            else:
+                abiertos.discard(titulo)
+        for columna, valor in enumerate(fila):
+            if isinstance(valor, str) and normalizar_etiqueta(valor) in buscados:
+                titulo = buscados[normalizar_etiqueta(valor)]
+                if titulo not in ubicados:
+                    ubicados[titulo] = (num_fila, columna)
+                    abiertos.add(titulo)
+        if len(ubicados) == len(buscados) and not abiertos:
+            break
+    return bloques
+
+def leer_timming(ruta_excel, titulos, ancho, hoja=None):
+    """Lee las tablas de timming de un libro abriéndolo en modo solo lectura,
+    sin pasar la hoja completa a pandas. La hoja es `hoja` o la que elige
+    hoja_timming. Devuelve (nombre de la hoja, bloques de leer_bloques).
+
+    No usa instantánea: la hoja mezcla títulos, encabezados y números en las
+    mismas columnas, que _columnas_arrow guardaría como texto (y leer_bloques
+    ya no reconocería las filas de datos); además leerla toma ~0,05 s."""
+    with pd.ExcelFile(ruta_excel, engine='openpyxl') as libro:
+        nombre = hoja_timming(libro.sheet_names, hoja)
+        if nombre is None:
+            raise ValueError(f"El libro {os.path.basename(ruta_excel)} no tiene una hoja de TIMMING")
+        return nombre, leer_bloques(libro.book[nombre], titulos, ancho)
+
+def posibles_rutas_libro(nombre_archivo):
+    """Ubicaciones donde buscar un libro, empezando por las coincidencias
+    encontradas recursivamente bajo el directorio actual"""
+    posibles_rutas = [
+        nombre_archivo,
+        os.path.join(".", nombre_archivo),
+        os.path.join(os.getcwd(), nombre_archivo),
+        os.path.join(r"C:\Users\USUARIO\Desktop\REPORTE MENSUAL WORLDTEL\DASHBOARD ANALISIS\WORLDTEL ANALISIS", nombre_archivo)
+    ]
+    nombre_base = os.path.splitext(nombre_archivo)[0]
+    try:
+        for archivo in glob.glob("**/*.xlsx", recursive=True):
+            # Excluir archivos temporales de Excel (~$)
+            if nombre_base in archivo and not os.path.basename(archivo).startswith("~$"):
+                posibles_rutas.insert(0, archivo)
+    except OSError:
+        pass
+    return posibles_rutas
+
+def resolver_ruta(posibles_rutas):
+    """Primera ruta existente de la lista (ignorando temporales ~$), o None"""
+    for ruta in posibles_rutas:
+        if os.path.basename(ruta).startswith("~$"):
+            continue
+        if os.path.isfile(ruta):
+            return ruta
+    return None
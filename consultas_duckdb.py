@@ -0,0 +1,148 @@
+"""Motor de consultas opcional sobre DuckDB para las secciones de agregados.
+
+Los pagos y las gestiones ya normalizados se copian una vez por versión de
+datos a una base DuckDB en memoria; las tablas por equipo, el gráfico de
+carteras, la evolución, el resumen del día y HOY x HOY se resuelven con SQL
+(DuckDB las ejecuta en paralelo con todos los núcleos) y solo vuelven a
+pandas los resultados, ya pequeños. Cada función devuelve lo mismo que su
+equivalente en analisis, de modo que el dashboard puede usar uno u otro.
+
+Requiere el paquete `duckdb`; sin él `disponible()` es False y el dashboard
+sigue con pandas.
+"""
+import pandas as pd
+
+import analisis
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Columnas que se copian a la base (las categorías pasan como texto)
+COLUMNAS_PAGOS = ['ASESOR', 'EQUIPO', 'CARTERA', 'RAZON_SOCIAL', 'FECHA_DE_PAGO', 'MONTO']
+COLUMNAS_GESTIONES = ['EQUIPO', 'FECHA_GESTION', 'FECHA_PROMESA', 'MONTO_PROMESA']
+
+def disponible():
+    """True si duckdb está instalado"""
+    return duckdb is not None
+
+def _como_texto(df, columnas):
+    datos = df[columnas].copy()
+    for col in columnas:
+        if isinstance(datos[col].dtype, pd.CategoricalDtype):
+            datos[col] = datos[col].astype(object)
+    return datos
+
+def conectar(df, df_gestiones_limpio=None, hilos=None):
+    """Base en memoria con las tablas `pagos` y `gestiones` (solo promesas válidas).
+    `hilos` limita los hilos de DuckDB (por defecto, todos los núcleos)."""
+    conexion = duckdb.connect(':memory:')
+    if hilos:
+        conexion.execute(f"SET threads TO {int(hilos)}")
+    tablas = {'pagos': _como_texto(df, COLUMNAS_PAGOS)}
+    if df_gestiones_limpio is not None:
+        tablas['gestiones'] = _como_texto(df_gestiones_limpio, COLUMNAS_GESTIONES)
+    for nombre, datos in tablas.items():
+        conexion.register('_origen', datos)
+        conexion.execute(f"CREATE TABLE {nombre} AS SELECT * FROM _origen")
+        conexion.unregister('_origen')
+    return conexion
+
+def _consulta(conexion, sql, parametros=None):
+    # Un cursor por consulta: la conexión se comparte entre sesiones
+    with conexion.cursor() as cursor:
+        return cursor.execute(sql, parametros or []).df()
+
+def _fechas(serie):
+    return pd.to_datetime(serie).astype('datetime64[ns]')
+
+def tablas_asesores(conexion):
+    """(df_asesores, df_asesores_simple) como analisis.tablas_asesores"""
+    df_asesores = _consulta(conexion, """
+        SELECT ASESOR, EQUIPO, CARTERA,
+               COALESCE(SUM(MONTO), 0) AS MONTO_TOTAL,
+               COUNT(DISTINCT RAZON_SOCIAL) AS NUM_RAZONES_SOCIALES,
+               list(DISTINCT RAZON_SOCIAL) FILTER (WHERE RAZON_SOCIAL IS NOT NULL) AS CLIENTES
+        FROM pagos
+        WHERE ASESOR IS NOT NULL AND EQUIPO IS NOT NULL AND CARTERA IS NOT NULL
+        GROUP BY ASESOR, EQUIPO, CARTERA
+        ORDER BY ASESOR, EQUIPO, CARTERA
+    """)
+    # Cartera dominante: la de más filas; un empate se resuelve con la menor
+    df_asesores_simple = _consulta(conexion, """
+        WITH dominante AS (
+            SELECT ASESOR, EQUIPO, CARTERA
+            FROM pagos
+            WHERE ASESOR IS NOT NULL AND EQUIPO IS NOT NULL AND CARTERA IS NOT NULL
+            GROUP BY ASESOR, EQUIPO, CARTERA
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY ASESOR, EQUIPO ORDER BY COUNT(*) DESC, CARTERA) = 1
+        )
+        SELECT p.ASESOR, p.EQUIPO,
+               COALESCE(SUM(p.MONTO), 0) AS MONTO_TOTAL,
+               COUNT(DISTINCT p.RAZON_SOCIAL) AS NUM_RAZONES_SOCIALES,
+               list(DISTINCT p.RAZON_SOCIAL) FILTER (WHERE p.RAZON_SOCIAL IS NOT NULL) AS CLIENTES,
+               ANY_VALUE(d.CARTERA) AS CARTERA
+        FROM pagos p
+        LEFT JOIN dominante d ON p.ASESOR = d.ASESOR AND p.EQUIPO = d.EQUIPO
+        WHERE p.ASESOR IS NOT NULL AND p.EQUIPO IS NOT NULL
+        GROUP BY p.ASESOR, p.EQUIPO
+        ORDER BY p.ASESOR, p.EQUIPO
+    """)
+    for tabla in (df_asesores, df_asesores_simple):
+        tabla['CLIENTES'] = tabla['CLIENTES'].map(lambda clientes: frozenset(clientes if clientes is not None else ()))
+    return df_asesores, df_asesores_simple
+
+def cartera_por_equipo(conexion):
+    """Monto y clientes por cartera y equipo, como analisis.cartera_por_equipo"""
+    return _consulta(conexion, """
+        SELECT CARTERA, EQUIPO, COALESCE(SUM(MONTO), 0) AS MONTO,
+               COUNT(DISTINCT RAZON_SOCIAL) AS CLIENTES
+        FROM pagos
+        WHERE CARTERA IS NOT NULL AND EQUIPO IS NOT NULL
+        GROUP BY CARTERA, EQUIPO
+        ORDER BY CARTERA, EQUIPO
+    """)
+
+def evolucion(conexion):
+    """Pagos diarios por equipo y su acumulado, como analisis.evolucion_desde_cubo"""
+    resultado = _consulta(conexion, """
+        SELECT FECHA, EQUIPO, MONTO_DIARIO,
+               SUM(MONTO_DIARIO) OVER (PARTITION BY EQUIPO ORDER BY FECHA) AS MONTO_ACUMULADO
+        FROM (
+            SELECT CAST(FECHA_DE_PAGO AS DATE) AS FECHA, EQUIPO, COALESCE(SUM(MONTO), 0) AS MONTO_DIARIO
+            FROM pagos
+            WHERE FECHA_DE_PAGO IS NOT NULL AND EQUIPO IS NOT NULL
+            GROUP BY FECHA, EQUIPO
+        )
+        ORDER BY FECHA, EQUIPO
+    """)
+    resultado['FECHA'] = _fechas(resultado['FECHA'])
+    return resultado
+
+def resumen_dia(conexion, fecha):
+    """Monto, pagos y clientes por equipo en un día, como analisis.resumen_dia"""
+    return _consulta(conexion, """
+        SELECT EQUIPO, COALESCE(SUM(MONTO), 0) AS MONTO_TOTAL,
+               COUNT(MONTO) AS CANTIDAD_PAGOS,
+               COUNT(DISTINCT RAZON_SOCIAL) AS CANTIDAD_CLIENTES
+        FROM pagos
+        WHERE CAST(FECHA_DE_PAGO AS DATE) = ? AND EQUIPO IS NOT NULL
+        GROUP BY EQUIPO
+        ORDER BY MONTO_TOTAL DESC
+    """, [pd.Timestamp(fecha).date()])
+
+def matriz_hoy_x_hoy(conexion, equipo=None):
+    """Matriz HOY x HOY dispersa, como analisis.matriz_hoy_x_hoy; `equipo` None incluye todos"""
+    celdas = _consulta(conexion, """
+        SELECT CAST(FECHA_GESTION AS DATE) AS FECHA_GESTION,
+               CAST(FECHA_PROMESA AS DATE) AS FECHA_PROMESA,
+               SUM(MONTO_PROMESA) AS MONTO_PROMESA
+        FROM gestiones
+        WHERE ? IS NULL OR EQUIPO = ?
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """, [equipo, equipo])
+    celdas['FECHA_GESTION'] = _fechas(celdas['FECHA_GESTION'])
+    celdas['FECHA_PROMESA'] = _fechas(celdas['FECHA_PROMESA'])
+    return analisis.matriz_desde_celdas(celdas.set_index(['FECHA_GESTION', 'FECHA_PROMESA'])['MONTO_PROMESA'])
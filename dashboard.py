@@ -1,9 +1,19 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 from datetime import datetime
+import os
+import sqlite3
+from carga import ESQUEMAS_ANALISIS, INCREMENTAL_CIERRE, STREAMING_GESTIONES, describir_fuente, huella_archivo, leer_libro, leer_libros, leer_timming, opciones_fuente, posibles_rutas_libro, resolver_fuentes, resolver_ruta
+import equipos
+import historial
+import consultas_duckdb
+import analisis
+from tablas_html import formato_moneda, formato_numero, formato_porcentaje, tabla_html
 
 # Configuración de la página
 st.set_page_config(page_title="Analisis Comparativo Worldtel", page_icon="📊", layout="wide", initial_sidebar_state="expanded")
@@ -138,43 +148,93 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+# ============================================
+# CACHÉ DE LECTURA DE EXCEL
+# ============================================
+@st.cache_resource
+def _registro_huellas():
+    """Última huella leída de cada archivo y hojas cacheadas con ella, y última
+    lectura en paralelo de cada grupo de libros (compartido entre sesiones)"""
+    return {}
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _leer_hojas_cacheadas(huella, hojas, header, streaming, incrementales, esquemas):
+    return leer_libro(huella[0], hojas, header=header, streaming=streaming,
+                      incrementales=incrementales, esquemas=esquemas)
+
+def leer_hojas_excel(ruta, hojas, header=0, streaming=None, incrementales=None, esquemas=None):
+    """Lee varias hojas de un libro (una sola apertura) pasando por la caché.
+
+    La clave incluye la huella del archivo, así que un rerun que solo cambia
+    un filtro no vuelve a abrir el libro con openpyxl; en frío se lee la
+    instantánea Arrow de cada hoja si está vigente. Si el archivo cambió
+    desde la última lectura, se descartan explícitamente las entradas de la
+    versión anterior.
+    """
+    hojas = tuple(hojas)
+    huella = huella_archivo(ruta)
+    registro = _registro_huellas()
+    anterior, lecturas = registro.get(huella[0], (None, {}))
+    if anterior is not None and anterior != huella:
+        for argumentos in lecturas.values():
+            _leer_hojas_cacheadas.clear(anterior, *argumentos)
+        lecturas = {}
+    argumentos = (hojas, header, streaming, incrementales, esquemas)
+    lecturas[repr(argumentos)] = argumentos
+    registro[huella[0]] = (huella, lecturas)
+    return _leer_hojas_cacheadas(huella, *argumentos)
+
+# Libros de origen: análisis (pagos y gestiones) y TIMMING, junto al dashboard.
+# HOJA_TIMMING None usa la última hoja 'TIMMING ...' del libro (ver carga.hoja_timming)
+HOJAS_ANALISIS = ('CIERRE DE PAGOS', 'GESTIONES')
+RUTA_TIMMING = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TIMMING WORLDTEL SET - OCT 2025.xlsx')
+HOJA_TIMMING = None
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def _leer_libros_cacheados(lecturas):
+    return leer_libros([
+        (huella[0], hojas, {'header': header, 'streaming': streaming,
+                            'incrementales': incrementales, 'esquemas': esquemas})
+        for huella, hojas, header, streaming, incrementales, esquemas in lecturas
+    ])
+
+def _opciones_analisis(fuente, hoja):
+    # GESTIONES se lee por streaming: solo las columnas que usa el dashboard.
+    # De CIERRE DE PAGOS, que solo crece, se leen solo las filas agregadas.
+    # Ambas salen con sus tipos normalizados (categorías, fechas, montos)
+    return opciones_fuente(fuente, hoja, streaming=STREAMING_GESTIONES,
+                           incrementales=INCREMENTAL_CIERRE, esquemas=ESQUEMAS_ANALISIS)
+
+def precargar_libros(fuentes):
+    """Lee a la vez, en procesos separados, cada hoja de análisis desde su fuente.
+    Devuelve (ruta absoluta, hoja) -> DataFrame, o {} si algo falla (cada carga relee su hoja)."""
+    lecturas = []
+    for hoja, fuente in fuentes.items():
+        opciones = _opciones_analisis(fuente, hoja)
+        lecturas.append((huella_archivo(fuente.ruta), (fuente.hoja,), opciones['header'],
+                         opciones['streaming'], opciones['incrementales'], opciones['esquemas']))
+    # Igual que leer_hojas_excel: si cambió algún libro del grupo se descarta
+    # la lectura anterior en vez de dejarla en caché hasta que la desplace otra
+    lecturas = tuple(lecturas)
+    registro = _registro_huellas()
+    clave = ('libros',) + tuple(lectura[0][0] for lectura in lecturas)
+    anteriores = registro.get(clave)
+    if anteriores is not None and anteriores != lecturas:
+        _leer_libros_cacheados.clear(anteriores)
+    registro[clave] = lecturas
+    try:
+        libros = _leer_libros_cacheados(lecturas)
+    except Exception:
+        return {}
+    return {(lectura[0][0], hoja): df_hoja
+            for lectura, hojas in zip(lecturas, libros) for hoja, df_hoja in hojas.items()}
+
 # Cargar datos
-def cargar_datos():
-    import os
-    import glob
-    
-    # Obtener el directorio actual
+def resolver_libro_analisis():
+    """Ruta de 'ANALISIS WORLDTEL.xlsx'; si no se encuentra, detiene el dashboard"""
     dir_actual = os.getcwd()
-    
-    # Buscar el archivo Excel en diferentes ubicaciones
-    posibles_rutas = [
-        "ANALISIS WORLDTEL.xlsx",
-        "./ANALISIS WORLDTEL.xlsx",
-        os.path.join(dir_actual, "ANALISIS WORLDTEL.xlsx"),
-        r"C:\Users\USUARIO\Desktop\REPORTE MENSUAL WORLDTEL\DASHBOARD ANALISIS\WORLDTEL ANALISIS\ANALISIS WORLDTEL.xlsx"
-    ]
-    
-    # También buscar recursivamente en el directorio actual
-    try:
-        archivos_xlsx = glob.glob("**/*.xlsx", recursive=True)
-        for archivo in archivos_xlsx:
-            # Excluir archivos temporales de Excel (~$)
-            if "ANALISIS WORLDTEL" in archivo and not archivo.startswith("~$"):
-                posibles_rutas.insert(0, archivo)
-    except:
-        pass
-    
-    ruta_archivo = None
-    for ruta in posibles_rutas:
-        try:
-            # Excluir archivos temporales (que comienzan con ~$)
-            if ruta.startswith("~$"):
-                continue
-            if os.path.exists(ruta) and os.path.isfile(ruta):
-                ruta_archivo = ruta
-                break
-        except:
-            continue
+    posibles_rutas = posibles_rutas_libro("ANALISIS WORLDTEL.xlsx")
+    ruta_archivo = resolver_ruta(posibles_rutas)
     
     if ruta_archivo is None:
         st.error("❌ No se encontró el archivo 'ANALISIS WORLDTEL.xlsx'")
@@ -185,157 +245,331 @@ def cargar_datos():
         st.warning("⚠️ Por favor, cierra el archivo Excel si está abierto y luego recarga la página")
         st.warning("📝 O coloca el archivo 'ANALISIS WORLDTEL.xlsx' en el mismo directorio que dashboard.py")
         st.stop()
+    return ruta_archivo
+
+def cargar_libro_analisis(fuentes, precargados):
+    """Lee CIERRE DE PAGOS y GESTIONES desde la fuente elegida para cada una
+    (ver carga.resolver_fuentes), salvo que ya vengan en `precargados`.
+    Devuelve (df_cierre, df_gestiones, huella de las fuentes); df_gestiones es
+    None si no existe la hoja. La huella es la del archivo de CIERRE DE PAGOS,
+    seguida de la del de GESTIONES si es otro archivo."""
+    hojas = {}
+    for hoja, fuente in fuentes.items():
+        df_hoja = precargados.get((os.path.abspath(fuente.ruta), fuente.hoja))
+        if df_hoja is None:
+            try:
+                df_hoja = leer_hojas_excel(fuente.ruta, [fuente.hoja], **_opciones_analisis(fuente, hoja)).get(fuente.hoja)
+            except PermissionError as e:
+                st.error("❌ El archivo está siendo utilizado por otra aplicación (probablemente Excel)")
+                st.warning("⚠️ Por favor, cierra el archivo Excel y luego recarga esta página")
+                st.info(f"📄 Archivo: {fuente.ruta}")
+                st.stop()
+            except Exception as e:
+                st.error(f"❌ Error al leer el archivo: {str(e)}")
+                st.info(f"📄 Archivo encontrado en: {fuente.ruta}")
+                st.stop()
+        if df_hoja is not None:
+            hojas[hoja] = df_hoja
     
-    try:
-        df = pd.read_excel(ruta_archivo, sheet_name='CIERRE DE PAGOS', engine='openpyxl')
-        return df
-    except PermissionError as e:
-        st.error("❌ El archivo está siendo utilizado por otra aplicación (probablemente Excel)")
-        st.warning("⚠️ Por favor, cierra el archivo Excel y luego recarga esta página")
-        st.info(f"📄 Archivo: {ruta_archivo}")
-        st.stop()
-    except Exception as e:
-        st.error(f"❌ Error al leer el archivo: {str(e)}")
-        st.info(f"📄 Archivo encontrado en: {ruta_archivo}")
+    if 'CIERRE DE PAGOS' not in hojas:
+        st.error("❌ El archivo no contiene la hoja 'CIERRE DE PAGOS'")
+        st.info(f"📄 Archivo encontrado en: {fuentes['CIERRE DE PAGOS'].ruta}")
         st.stop()
+    
+    huellas = list(dict.fromkeys(huella_archivo(fuente.ruta) for fuente in fuentes.values()))
+    huella = huellas[0] + tuple(huellas[1:]) if len(huellas) > 1 else huellas[0]
+    return hojas['CIERRE DE PAGOS'], hojas.get('GESTIONES'), huella
 
-df = cargar_datos()
-
-# Definir los equipos
-equipo_worldtel = [
-    'Laura Villanueva Solayo',
-    'Cherry Nathalia Matson Zambrano',
-    'Sandra Maria Benavides Vela',
-    'Carmen Dora Niño Ordinola',
-    'Daniel Alejandro Barrios Pavon',
-    'Juan Jose Felix Ventura',
-    'Rosa Elena Villarreal Pelaez',
-    'Carla del Rosario Castillo Alvarez',
-    'Lesly Dayanne Zarate Roman'
-]
+# ============================================
+# HISTÓRICO MENSUAL
+# ============================================
+# Cada libro cargado se guarda por periodo en historial.sqlite; los periodos
+# anteriores se consultan desde ahí sin abrir ningún Excel
+RUTA_HISTORIAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'historial.sqlite')
+LIBRO_ACTUAL = 'Libro actual'
+
+def listar_periodos():
+    try:
+        return historial.periodos(RUTA_HISTORIAL)
+    except sqlite3.Error as e:
+        st.sidebar.warning(f"⚠️ No se pudo abrir el histórico: {str(e)}")
+        return []
+
+# El selector se dibuja aquí pero se arma después de archivar el libro actual,
+# para que su periodo ya figure en la lista; su valor llega en session_state
+contenedor_periodo = st.sidebar.container()
+periodos_guardados = listar_periodos()
+if st.session_state.get('selectbox_periodo') not in periodos_guardados:
+    st.session_state['selectbox_periodo'] = LIBRO_ACTUAL
+periodo_elegido = st.session_state['selectbox_periodo']
+es_historico = periodo_elegido != LIBRO_ACTUAL
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _leer_periodo_historico(periodo, version):
+    return historial.leer_periodo(RUTA_HISTORIAL, periodo)
+
+def cargar_periodo_historico(periodo):
+    """Lee pagos y gestiones de un periodo guardado.
+    Devuelve (df_cierre, df_gestiones, versión del periodo) como cargar_libro_analisis"""
+    version = historial.version_periodo(RUTA_HISTORIAL, periodo)
+    df_cierre, df_gest = _leer_periodo_historico(periodo, version)
+    return df_cierre.copy(), (None if df_gest is None else df_gest.copy()), version
+
+libros_precargados = {}
+if es_historico:
+    df, df_gestiones, huella_libro = cargar_periodo_historico(periodo_elegido)
+else:
+    # Cada hoja se lee de la fuente más liviana al día (archivo por hoja,
+    # instantánea o libro combinado), todas a la vez
+    ruta_libro = resolver_libro_analisis()
+    fuentes_analisis = resolver_fuentes(ruta_libro, HOJAS_ANALISIS, STREAMING_GESTIONES)
+    libros_precargados = precargar_libros(fuentes_analisis)
+    df, df_gestiones, huella_libro = cargar_libro_analisis(fuentes_analisis, libros_precargados)
+    st.sidebar.caption("📂 Fuentes de datos")
+    for hoja, fuente in fuentes_analisis.items():
+        st.sidebar.caption(f"{hoja}: {describir_fuente(fuente)}")
+
+# Filas del libro y cuántas ya estaban en la carga anterior (si solo se agregaron pagos)
+filas_libro = len(df)
+filas_previas = df.attrs.get('filas_previas')
+
+# Definir los equipos desde el registro (equipos.json junto a dashboard.py)
+RUTA_EQUIPOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'equipos.json')
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _cargar_registro_equipos(huella):
+    return equipos.cargar_registro(huella[0])
+
+try:
+    huella_equipos = huella_archivo(RUTA_EQUIPOS)
+    registro_equipos = _cargar_registro_equipos(huella_equipos)
+except (OSError, ValueError, KeyError) as e:
+    st.error(f"❌ No se pudo leer el registro de equipos: {str(e)}")
+    st.info(f"📄 Archivo: {RUTA_EQUIPOS}")
+    st.stop()
+
+equipo_worldtel = equipos.miembros(registro_equipos, 'WORLDTEL')
+
+def clasificar_equipo(nombres, fechas=None):
+    """Asigna el equipo a cada asesor/gestor con una búsqueda hash en el registro de equipos"""
+    return equipos.clasificar(nombres, registro_equipos, fechas)
+
+# Los alias del registro (p. ej. nombres cortos de los archivos por hoja)
+# pasan a su nombre canónico antes de clasificar
+df['ASESOR'] = equipos.nombres_canonicos(df['ASESOR'], registro_equipos)
+if df_gestiones is not None:
+    df_gestiones['GESTOR'] = equipos.nombres_canonicos(df_gestiones['GESTOR'], registro_equipos)
 
 # Clasificar asesores
-df['EQUIPO'] = df['ASESOR'].apply(lambda x: 'WORLDTEL' if x in equipo_worldtel else 'GI CORONADO')
+df['EQUIPO'] = clasificar_equipo(df['ASESOR'], df['FECHA_DE_PAGO'])
 
 # Remover filas con ASESOR nulo o ESTUDIO
 df = df[df['ASESOR'].notna() & (df['ASESOR'] != 'ESTUDIO')].copy()
 
-# Crear tabla de asesores con todas sus carteras
-df_asesores = df.groupby(['ASESOR', 'EQUIPO', 'CARTERA']).agg({
-    'MONTO': 'sum',
-    'RAZON_SOCIAL': 'nunique'
-}).reset_index()
-
-df_asesores.columns = ['ASESOR', 'EQUIPO', 'CARTERA', 'MONTO_TOTAL', 'NUM_RAZONES_SOCIALES']
+# Clasificar gestores una sola vez: HOY x HOY, efectividad y avance día a día
+# reutilizan EQUIPO y las promesas válidas de df_gestiones_limpio
+if df_gestiones is not None and not df_gestiones.empty:
+    df_gestiones['EQUIPO'] = clasificar_equipo(df_gestiones['GESTOR'], df_gestiones['FECHA_GESTION'])
+    
+    # Limpiar datos
+    df_gestiones_limpio = analisis.limpiar_gestiones(df_gestiones)
+
+# Versión de los datos: cambia si cambia el libro o el registro de equipos
+version_datos = (huella_libro, huella_equipos)
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _archivar_libro(version, origenes, _df, _df_gestiones):
+    """Guarda el periodo del libro en el histórico una vez por versión de datos.
+    `origenes` son los archivos de los que se leyeron pagos y gestiones"""
+    periodo = historial.periodo_dominante(_df['FECHA_DE_PAGO'])
+    if periodo is not None:
+        historial.guardar_periodo(RUTA_HISTORIAL, periodo, _df, _df_gestiones,
+                                  origen=origenes[0], origen_gestiones=origenes[1])
+    return periodo
+
+if not es_historico:
+    try:
+        _archivar_libro(version_datos, (fuentes_analisis['CIERRE DE PAGOS'].ruta, fuentes_analisis['GESTIONES'].ruta),
+                        df, df_gestiones)
+    except sqlite3.Error as e:
+        st.sidebar.warning(f"⚠️ No se pudo guardar el periodo en el histórico: {str(e)}")
+    periodos_guardados = listar_periodos()
 
-# Para la tabla de equipos simplificada, agregar por asesor sin cartera
-df_asesores_simple = df.groupby(['ASESOR', 'EQUIPO']).agg({
-    'MONTO': 'sum',
-    'RAZON_SOCIAL': 'nunique',
-    'CARTERA': lambda x: x.mode()[0] if len(x.mode()) > 0 else x.iloc[0]
-}).reset_index()
+with contenedor_periodo:
+    st.selectbox("📆 Periodo", options=[LIBRO_ACTUAL] + periodos_guardados, key="selectbox_periodo")
 
-df_asesores_simple.columns = ['ASESOR', 'EQUIPO', 'MONTO_TOTAL', 'NUM_RAZONES_SOCIALES', 'CARTERA']
+# ============================================
+# CUBO DE AGREGADOS DE PAGOS
+# ============================================
+@st.cache_resource
+def _estado_pagos():
+    """Agregados de pagos vigentes por libro (compartido entre sesiones)"""
+    return {}
 
-# Tablas por equipo
-col1, col2 = st.columns(2)
+def agregados_pagos(df, version, filas_libro, filas_previas):
+    """Cubo y evolución de pagos de esta versión de datos.
 
-def crear_tabla_jerarquica_equipo(df_equipo_completo):
-    """Crea tabla jerárquica con Cartera como encabezado y asesores debajo, usando df_asesores con carteras"""
-    tabla_jer = []
-    
-    # Obtener carteras únicas para este equipo
-    carteras_eq = sorted(df_equipo_completo['CARTERA'].unique())
+    Si el libro solo ganó filas al final respecto de la versión ya procesada
+    (y el registro de equipos es el mismo), se agregan únicamente las filas
+    nuevas al cubo y a la evolución guardados; si no, se recalculan completos.
+    """
+    estado = _estado_pagos()
+    previo = estado.get(version[0][0])
+    if previo is not None and previo['version'] == version:
+        return previo['cubo'], previo['evolucion']
     
-    for cartera in carteras_eq:
-        df_cartera_eq = df_equipo_completo[df_equipo_completo['CARTERA'] == cartera]
-        total_monto_cartera = df_cartera_eq['MONTO_TOTAL'].sum()
-        total_clientes_cartera = df_cartera_eq['NUM_RAZONES_SOCIALES'].sum()
-        
-        # Fila de cartera
-        tabla_jer.append({
-            'Cartera / Asesor': f"◼ {cartera}",
-            'Clientes': int(total_clientes_cartera),
-            'Monto': f"S/ {total_monto_cartera:,.2f}",
-            '_es_header': True
-        })
-        
-        # Asesores bajo esta cartera (pueden repetirse si están en otras carteras)
-        df_asesores_eq = df_cartera_eq.sort_values('MONTO_TOTAL', ascending=False)
-        for idx, row in df_asesores_eq.iterrows():
-            tabla_jer.append({
-                'Cartera / Asesor': f"  {row['ASESOR']}",
-                'Clientes': int(row['NUM_RAZONES_SOCIALES']),
-                'Monto': f"S/ {row['MONTO_TOTAL']:,.2f}",
-                '_es_header': False
-            })
+    if (previo is not None and filas_previas is not None
+            and previo['filas'] == filas_previas and previo['version'][1:] == version[1:]):
+        cubo_nuevo = analisis.construir_cubo(df[df.index >= filas_previas])
+        cubo = analisis.fusionar_cubos(previo['cubo'], cubo_nuevo)
+        evolucion = analisis.actualizar_evolucion(previo['evolucion'], cubo_nuevo)
+    else:
+        cubo = analisis.construir_cubo(df)
+        evolucion = analisis.evolucion_desde_cubo(cubo)
     
-    return pd.DataFrame(tabla_jer)
+    estado[version[0][0]] = {'version': version, 'filas': filas_libro, 'cubo': cubo, 'evolucion': evolucion}
+    return cubo, evolucion
+
+# Motor de consultas: pandas sobre el cubo, o SQL en DuckDB si está instalado y
+# se elige en la barra lateral (mismos resultados, pensado para datos de un año)
+MOTOR_PANDAS, MOTOR_DUCKDB = 'pandas', 'duckdb'
+motor = MOTOR_PANDAS
+if consultas_duckdb.disponible() and st.sidebar.toggle("⚡ Consultas con DuckDB", value=False, key="toggle_duckdb"):
+    motor = MOTOR_DUCKDB
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _conexion_duckdb(version, _df, _df_gestiones_limpio):
+    # cache_resource: una base por versión de datos, compartida entre sesiones
+    return consultas_duckdb.conectar(_df, _df_gestiones_limpio)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _evolucion_duckdb(version, _conexion):
+    return consultas_duckdb.evolucion(_conexion)
+
+if motor == MOTOR_DUCKDB:
+    hay_gestiones = df_gestiones is not None and not df_gestiones.empty
+    conexion_duckdb = _conexion_duckdb(version_datos, df, df_gestiones_limpio if hay_gestiones else None)
+    cubo_pagos, evolucion_pagos = None, _evolucion_duckdb(version_datos, conexion_duckdb)
+    fuente_pagos = conexion_duckdb
+else:
+    cubo_pagos, evolucion_pagos = agregados_pagos(df, version_datos, filas_libro, filas_previas)
+    fuente_pagos = cubo_pagos
+
+# ============================================
+# CÁLCULOS CACHEADOS POR VERSIÓN DE DATOS
+# ============================================
+# Las funciones de analisis son puras: la clave es la versión de los datos más
+# los filtros, y los DataFrames van como argumentos no hasheados (_df).
+# `motor` elige entre analisis (cubo / DataFrame) y consultas_duckdb (conexión)
+@st.cache_data(show_spinner=False, max_entries=4)
+def _tablas_asesores(version, motor, _fuente):
+    if motor == MOTOR_DUCKDB:
+        return consultas_duckdb.tablas_asesores(_fuente)
+    return analisis.tablas_asesores(_fuente)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _tablas_jerarquicas(version, equipo, _df_asesores):
+    if equipo is None:
+        return analisis.tabla_jerarquica(_df_asesores, mostrar_equipo=True)
+    return analisis.tabla_jerarquica(_df_asesores[_df_asesores['EQUIPO'] == equipo])
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _indice_por_dia(version, columna_fecha, _df):
+    # cache_resource: el índice se comparte sin copiar (se usa solo para lectura)
+    return analisis.indexar_por_dia(_df, columna_fecha)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _matriz_hoy_x_hoy(version, motor, equipo, _fuente):
+    if motor == MOTOR_DUCKDB:
+        return consultas_duckdb.matriz_hoy_x_hoy(_fuente, equipo)
+    return analisis.matriz_hoy_x_hoy(_fuente, equipo)
+
+# Figuras de Plotly: se guarda su JSON por (versión, gráfico, filtros) y se
+# rearma desde él, sin volver a pasar por plotly.express; al llenarse la
+# caché se descarta la figura usada hace más tiempo
+@st.cache_data(show_spinner=False, max_entries=32)
+def _figura_json(version, id_grafico, filtros, _construir):
+    return _construir().to_json()
+
+def figura_cacheada(version, id_grafico, construir, filtros=()):
+    """Figura de `construir()` (sin argumentos), armada solo si no está en caché"""
+    return pio.from_json(_figura_json(version, id_grafico, filtros, construir))
+
+# Las figuras dependen de los datos y del motor que armó sus tablas
+version_figuras = (version_datos, motor)
+
+# Tabla de asesores con todas sus carteras, y simplificada por asesor sin cartera
+df_asesores, df_asesores_simple = _tablas_asesores(version_datos, motor, fuente_pagos)
+
+# Tablas por equipo
+col1, col2 = st.columns(2)
 
 def mostrar_tabla_html(df_tabla, columnas):
-    """Convierte DataFrame a tabla HTML con estilos personalizados"""
-    html_table = "<table style='width:100%; border-collapse: collapse;'>\n"
-    html_table += "<tr style='background-color: #e8e8e8; font-weight: bold;'>"
-    for col in columnas:
-        if col == 'Monto' or col == 'Monto ($)':
-            html_table += f"<th style='padding: 10px; border: 1px solid #ddd; text-align: right;'>{col}</th>"
-        elif col == 'Clientes':
-            html_table += f"<th style='padding: 10px; border: 1px solid #ddd; text-align: center;'>{col}</th>"
-        else:
-            html_table += f"<th style='padding: 10px; border: 1px solid #ddd; text-align: left;'>{col}</th>"
-    html_table += "</tr>\n"
+    """Convierte una tabla jerárquica (Cartera / Asesor, Clientes, Monto) a HTML:
+    las filas de cartera van resaltadas; `columnas` da los títulos a mostrar"""
+    vista = df_tabla.assign(Monto=formato_moneda(df_tabla['Monto']))
+    clases = df_tabla['_es_header'].map({True: 'cabecera', False: 'normal'})
+    return tabla_html(
+        vista, dict(zip(['Cartera / Asesor', 'Clientes', 'Monto'], columnas)),
+        alineacion={'Clientes': 'center', 'Monto': 'right'},
+        clases_fila=clases, relleno_encabezado='10px'
+    )
+
+def mostrar_tabla_paginada(clave, ordenes, filtrar, renderizar, grupo=None, unidad='filas',
+                           por_pagina=(25, 50, 100, 200)):
+    """Tabla con búsqueda, orden y paginación del lado del servidor: solo la
+    página visible se convierte a HTML y se envía al navegador.
+
+    `ordenes` mapea la etiqueta de cada orden a los argumentos de
+    `filtrar(texto, *argumentos)`, que devuelve la tabla completa filtrada y
+    ordenada; `renderizar(filas)` arma el HTML de una página. Con `grupo` se
+    pagina por grupos completos (ver analisis.pagina_tabla).
+    """
+    col_busqueda, col_orden, col_tamano, col_pagina = st.columns([3, 2, 1, 1])
+    with col_busqueda:
+        texto = st.text_input("🔎 Buscar", key=f"{clave}_buscar")
+    with col_orden:
+        orden = st.selectbox("Ordenar por", options=list(ordenes), key=f"{clave}_orden")
+    with col_tamano:
+        tamano = st.selectbox(f"{unidad.capitalize()} por página", options=por_pagina, index=1, key=f"{clave}_tamano")
     
-    for idx, row in df_tabla.iterrows():
-        is_header = row.get('_es_header', False)
-        if is_header:
-            bg_color = "#fff3cd"
-            font_weight = "bold"
-        else:
-            bg_color = "#ffffff"
-            font_weight = "normal"
-        
-        html_table += f"<tr style='background-color: {bg_color}; font-weight: {font_weight};'>"
-        for col in columnas:
-            if col == 'Monto' or col == 'Monto ($)':
-                html_table += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: right;'>{row[col]}</td>"
-            elif col == 'Clientes':
-                html_table += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{row[col]}</td>"
-            else:
-                html_table += f"<td style='padding: 8px; border: 1px solid #ddd;'>{row[col]}</td>"
-        html_table += "</tr>\n"
+    tabla = filtrar(texto, *ordenes[orden])
+    
+    # La página guardada se acota al rango actual (una búsqueda puede reducirlo)
+    clave_pagina = f"{clave}_pagina"
+    vista = analisis.pagina_tabla(tabla, st.session_state.get(clave_pagina, 1), tamano, grupo)
+    st.session_state[clave_pagina] = vista.pagina
+    with col_pagina:
+        st.number_input("Página", min_value=1, max_value=vista.total_paginas, key=clave_pagina,
+                        disabled=vista.total_paginas == 1)
     
-    html_table += "</table>"
-    return html_table
+    if vista.filas.empty:
+        st.info("Sin resultados para la búsqueda")
+        return
+    st.markdown(renderizar(vista.filas), unsafe_allow_html=True)
+    st.caption(f"Página {vista.pagina} de {vista.total_paginas} · {vista.total:,} {unidad}")
 
 with col1:
     st.markdown('<div class="team-header worldtel-header">🟦 EQUIPO WORLDTEL</div>', unsafe_allow_html=True)
-    df_worldtel_completo = df_asesores[df_asesores['EQUIPO'] == 'WORLDTEL']
     
     # Mostrar tabla jerárquica (con carteras)
-    tabla_worldtel_jer = crear_tabla_jerarquica_equipo(df_worldtel_completo)
+    tabla_worldtel_jer = _tablas_jerarquicas(version_datos, 'WORLDTEL', df_asesores)
     html_tabla_worldtel = mostrar_tabla_html(tabla_worldtel_jer, ['Cartera / Asesor', 'Clientes', 'Monto'])
     st.markdown(html_tabla_worldtel, unsafe_allow_html=True)
     
-    # Métricas Worldtel (desde df_asesores_simple para no duplicar)
-    df_worldtel_simple = df_asesores_simple[df_asesores_simple['EQUIPO'] == 'WORLDTEL']
-    monto_worldtel = df_worldtel_simple['MONTO_TOTAL'].sum()
-    razones_worldtel = df_worldtel_simple['NUM_RAZONES_SOCIALES'].sum()
-    asesores_worldtel = len(df_worldtel_simple)
+    # Métricas Worldtel (clientes distintos: un cliente con varios asesores cuenta una vez)
+    monto_worldtel, razones_worldtel, asesores_worldtel = analisis.resumen_equipo(df_asesores_simple, 'WORLDTEL')
 
 with col2:
     st.markdown('<div class="team-header gi-header">🟧 EQUIPO GI CORONADO</div>', unsafe_allow_html=True)
-    df_gi_completo = df_asesores[df_asesores['EQUIPO'] == 'GI CORONADO']
     
     # Mostrar tabla jerárquica (con carteras)
-    tabla_gi_jer = crear_tabla_jerarquica_equipo(df_gi_completo)
+    tabla_gi_jer = _tablas_jerarquicas(version_datos, 'GI CORONADO', df_asesores)
     html_tabla_gi = mostrar_tabla_html(tabla_gi_jer, ['Cartera / Asesor', 'Clientes', 'Monto'])
     st.markdown(html_tabla_gi, unsafe_allow_html=True)
     
-    # Métricas GI Coronado (desde df_asesores_simple para no duplicar)
-    df_gi_simple = df_asesores_simple[df_asesores_simple['EQUIPO'] == 'GI CORONADO']
-    monto_gi = df_gi_simple['MONTO_TOTAL'].sum()
-    razones_gi = df_gi_simple['NUM_RAZONES_SOCIALES'].sum()
-    asesores_gi = len(df_gi_simple)
+    # Métricas GI Coronado (clientes distintos)
+    monto_gi, razones_gi, asesores_gi = analisis.resumen_equipo(df_asesores_simple, 'GI CORONADO')
 
 # Métricas alineadas horizontalmente
 st.markdown("### Resumen de Equipos")
@@ -399,26 +633,32 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Gráfico de Monto por Equipo
-    datos_equipo = df_asesores_simple.groupby('EQUIPO')['MONTO_TOTAL'].sum().reset_index()
-    fig_monto = px.bar(datos_equipo, x='EQUIPO', y='MONTO_TOTAL', 
-                       title='Monto Total por Equipo',
-                       color='EQUIPO',
-                       color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
-                       labels={'MONTO_TOTAL': 'Monto (S/)', 'EQUIPO': 'Equipo'})
-    fig_monto.update_layout(showlegend=False, hovermode='x unified', height=450)
-    fig_monto.update_traces(marker_line_width=2, marker_line_color='white')
+    def construir_fig_monto():
+        datos_equipo = df_asesores_simple.groupby('EQUIPO', observed=True)['MONTO_TOTAL'].sum().reset_index()
+        fig_monto = px.bar(datos_equipo, x='EQUIPO', y='MONTO_TOTAL', 
+                           title='Monto Total por Equipo',
+                           color='EQUIPO',
+                           color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
+                           labels={'MONTO_TOTAL': 'Monto (S/)', 'EQUIPO': 'Equipo'})
+        fig_monto.update_layout(showlegend=False, hovermode='x unified', height=450)
+        fig_monto.update_traces(marker_line_width=2, marker_line_color='white')
+        return fig_monto
+    fig_monto = figura_cacheada(version_figuras, 'monto_equipo', construir_fig_monto)
     st.plotly_chart(fig_monto, use_container_width=True)
 
 with col2:
     # Gráfico de Razones Sociales por Equipo
-    datos_razones = df_asesores_simple.groupby('EQUIPO')['NUM_RAZONES_SOCIALES'].sum().reset_index()
-    fig_razones = px.bar(datos_razones, x='EQUIPO', y='NUM_RAZONES_SOCIALES',
-                        title='Total de Clientes por Equipo',
-                        color='EQUIPO',
-                        color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
-                        labels={'NUM_RAZONES_SOCIALES': 'Cantidad', 'EQUIPO': 'Equipo'})
-    fig_razones.update_layout(showlegend=False, hovermode='x unified', height=450)
-    fig_razones.update_traces(marker_line_width=2, marker_line_color='white')
+    def construir_fig_razones():
+        datos_razones = analisis.clientes_por_equipo(df_asesores_simple)
+        fig_razones = px.bar(datos_razones, x='EQUIPO', y='NUM_RAZONES_SOCIALES',
+                            title='Total de Clientes por Equipo',
+                            color='EQUIPO',
+                            color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
+                            labels={'NUM_RAZONES_SOCIALES': 'Cantidad', 'EQUIPO': 'Equipo'})
+        fig_razones.update_layout(showlegend=False, hovermode='x unified', height=450)
+        fig_razones.update_traces(marker_line_width=2, marker_line_color='white')
+        return fig_razones
+    fig_razones = figura_cacheada(version_figuras, 'clientes_equipo', construir_fig_razones)
     st.plotly_chart(fig_razones, use_container_width=True)
 
 # Desempeño por Asesor
@@ -428,94 +668,84 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.markdown('<div class="team-header worldtel-header">🟦 WORLDTEL</div>', unsafe_allow_html=True)
-    fig_worldtel = px.bar(df_worldtel_simple.sort_values('MONTO_TOTAL', ascending=True),
-                          x='MONTO_TOTAL', y='ASESOR',
-                          orientation='h',
-                          title='Monto por Asesor',
-                          color='MONTO_TOTAL',
-                          color_continuous_scale='Blues',
-                          labels={'MONTO_TOTAL': 'Monto (S/)', 'ASESOR': 'Asesor'})
-    fig_worldtel.update_layout(height=400, showlegend=False, hovermode='closest')
-    fig_worldtel.update_traces(marker_line_width=1.5, marker_line_color='white')
+    def construir_fig_worldtel():
+        fig_worldtel = px.bar(df_asesores_simple[df_asesores_simple['EQUIPO'] == 'WORLDTEL'].sort_values('MONTO_TOTAL', ascending=True),
+                              x='MONTO_TOTAL', y='ASESOR',
+                              orientation='h',
+                              title='Monto por Asesor',
+                              color='MONTO_TOTAL',
+                              color_continuous_scale='Blues',
+                              labels={'MONTO_TOTAL': 'Monto (S/)', 'ASESOR': 'Asesor'})
+        fig_worldtel.update_layout(height=400, showlegend=False, hovermode='closest')
+        fig_worldtel.update_traces(marker_line_width=1.5, marker_line_color='white')
+        return fig_worldtel
+    fig_worldtel = figura_cacheada(version_figuras, 'asesores_worldtel', construir_fig_worldtel)
     st.plotly_chart(fig_worldtel, use_container_width=True)
 
 with col2:
     st.markdown('<div class="team-header gi-header">🟧 GI CORONADO</div>', unsafe_allow_html=True)
-    fig_gi = px.bar(df_gi_simple.sort_values('MONTO_TOTAL', ascending=True),
-                    x='MONTO_TOTAL', y='ASESOR',
-                    orientation='h',
-                    title='Monto por Asesor',
-                    color='MONTO_TOTAL',
-                    color_continuous_scale='Oranges',
-                    labels={'MONTO_TOTAL': 'Monto (S/)', 'ASESOR': 'Asesor'})
-    fig_gi.update_layout(height=400, showlegend=False, hovermode='closest')
-    fig_gi.update_traces(marker_line_width=1.5, marker_line_color='white')
+    def construir_fig_gi():
+        fig_gi = px.bar(df_asesores_simple[df_asesores_simple['EQUIPO'] == 'GI CORONADO'].sort_values('MONTO_TOTAL', ascending=True),
+                        x='MONTO_TOTAL', y='ASESOR',
+                        orientation='h',
+                        title='Monto por Asesor',
+                        color='MONTO_TOTAL',
+                        color_continuous_scale='Oranges',
+                        labels={'MONTO_TOTAL': 'Monto (S/)', 'ASESOR': 'Asesor'})
+        fig_gi.update_layout(height=400, showlegend=False, hovermode='closest')
+        fig_gi.update_traces(marker_line_width=1.5, marker_line_color='white')
+        return fig_gi
+    fig_gi = figura_cacheada(version_figuras, 'asesores_gi', construir_fig_gi)
     st.plotly_chart(fig_gi, use_container_width=True)
 
 # Análisis por Cartera
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 st.markdown('<h2 class="section-title">📋 Análisis por Cartera</h2>', unsafe_allow_html=True)
 
-# Datos por cartera, asesor y equipo
-df_cartera_detalle = df_asesores.copy()
-
 # Agrupar por cartera para el gráfico
-df_cartera_chart = df.groupby(['CARTERA', 'EQUIPO']).agg({
-    'MONTO': 'sum',
-    'RAZON_SOCIAL': 'nunique'
-}).reset_index()
-df_cartera_chart.columns = ['CARTERA', 'EQUIPO', 'MONTO', 'CLIENTES']
-
-# Gráfico de cartera
-fig_cartera = px.bar(df_cartera_chart, x='CARTERA', y='MONTO', color='EQUIPO',
-                     title='Monto por Cartera y Equipo',
-                     color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
-                     labels={'MONTO': 'Monto (S/)', 'CARTERA': 'Cartera'},
-                     barmode='group')
-fig_cartera.update_layout(height=450, hovermode='x unified')
-fig_cartera.update_traces(marker_line_width=1.5, marker_line_color='white')
+def construir_fig_cartera():
+    if motor == MOTOR_DUCKDB:
+        df_cartera_chart = consultas_duckdb.cartera_por_equipo(conexion_duckdb)
+    else:
+        df_cartera_chart = analisis.cartera_por_equipo(cubo_pagos)
+
+    # Gráfico de cartera
+    fig_cartera = px.bar(df_cartera_chart, x='CARTERA', y='MONTO', color='EQUIPO',
+                         title='Monto por Cartera y Equipo',
+                         color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
+                         labels={'MONTO': 'Monto (S/)', 'CARTERA': 'Cartera'},
+                         barmode='group')
+    fig_cartera.update_layout(height=450, hovermode='x unified')
+    fig_cartera.update_traces(marker_line_width=1.5, marker_line_color='white')
+    return fig_cartera
+fig_cartera = figura_cacheada(version_figuras, 'cartera_equipo', construir_fig_cartera)
 st.plotly_chart(fig_cartera, use_container_width=True)
 
 # Tabla jerárquica por Cartera y Asesor
 st.markdown("### Detalle por Cartera y Asesor")
 
-# Crear tabla jerárquica usando df_asesores (que tiene carteras múltiples)
-tabla_jerarquica = []
-
-carteras_ordenadas = sorted(df_asesores['CARTERA'].unique())
-
-for cartera in carteras_ordenadas:
-    df_cartera_actual = df_asesores[df_asesores['CARTERA'] == cartera]
-    
-    # Totales por cartera
-    total_monto_cartera = df_cartera_actual['MONTO_TOTAL'].sum()
-    total_clientes_cartera = df_cartera_actual['NUM_RAZONES_SOCIALES'].sum()
-    
-    # Fila de la cartera (header)
-    tabla_jerarquica.append({
-        'Cartera / Asesor': f"◼ {cartera}",
-        'Clientes': int(total_clientes_cartera),
-        'Monto ($)': f"S/ {total_monto_cartera:,.2f}",
-        '_es_header': True
-    })
-    
-    # Asesores bajo esta cartera ordenados por monto
-    df_asesores_cartera = df_cartera_actual.sort_values('MONTO_TOTAL', ascending=False)
-    
-    for idx, row in df_asesores_cartera.iterrows():
-        tabla_jerarquica.append({
-            'Cartera / Asesor': f"    {row['ASESOR']} ({row['EQUIPO']})",
-            'Clientes': int(row['NUM_RAZONES_SOCIALES']),
-            'Monto ($)': f"S/ {row['MONTO_TOTAL']:,.2f}",
-            '_es_header': False
-        })
-
-# Convertir a DataFrame
-tabla_jerarquica_df = pd.DataFrame(tabla_jerarquica)
+# Tabla jerárquica de todas las carteras, con el equipo de cada asesor
+tabla_jerarquica_df = _tablas_jerarquicas(version_datos, None, df_asesores)
+
+# Las secciones con filtros propios son fragmentos (st.fragment): cambiar uno
+# de sus filtros vuelve a ejecutar solo esa sección, con los datos que recibió
+# en la última ejecución completa del script
+@st.fragment
+def seccion_detalle_cartera(tabla_jerarquica_df):
+    # Paginada por carteras completas; la búsqueda encuentra carteras o asesores
+    mostrar_tabla_paginada(
+        'detalle_cartera',
+        {
+            'Cartera': ('_cartera', True),
+            'Monto (mayor a menor)': ('Monto', False),
+            'Clientes (mayor a menor)': ('Clientes', False)
+        },
+        lambda texto, orden, ascendente: analisis.filtrar_jerarquica(tabla_jerarquica_df, texto, orden, ascendente),
+        lambda filas: mostrar_tabla_html(filas, ['Cartera / Asesor', 'Clientes', 'Monto ($)']),
+        grupo='_cartera', unidad='carteras', por_pagina=(5, 10, 20, 50)
+    )
 
-# Crear tabla HTML con estilos personalizados
-html_tabla_detalle = mostrar_tabla_html(tabla_jerarquica_df, ['Cartera / Asesor', 'Clientes', 'Monto ($)'])
-st.markdown(html_tabla_detalle, unsafe_allow_html=True)
+seccion_detalle_cartera(tabla_jerarquica_df)
 
 # Resumen General
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
@@ -558,114 +788,90 @@ with col4:
         </div>
     """, unsafe_allow_html=True)
 
+# Comparativo mes a mes desde el histórico (solo si hay más de un periodo)
+@st.cache_data(show_spinner=False, max_entries=4)
+def _resumen_mensual(version):
+    return historial.resumen_mensual(RUTA_HISTORIAL)
+
+if len(periodos_guardados) > 1:
+    st.markdown("### Comparativo Mensual")
+    version_mensual = historial.version_historial(RUTA_HISTORIAL)
+    def construir_fig_mensual():
+        df_mensual = _resumen_mensual(version_mensual)
+        df_mensual = df_mensual[df_mensual['EQUIPO'].isin(['WORLDTEL', 'GI CORONADO'])]
+        fig_mensual = px.bar(df_mensual, x='PERIODO', y='MONTO', color='EQUIPO',
+                             title='Monto Recaudado por Periodo y Equipo',
+                             color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
+                             labels={'MONTO': 'Monto (S/)', 'PERIODO': 'Periodo'},
+                             hover_data=['PAGOS', 'CLIENTES'],
+                             barmode='group')
+        fig_mensual.update_layout(height=400, hovermode='x unified')
+        fig_mensual.update_xaxes(type='category')
+        return fig_mensual
+    fig_mensual = figura_cacheada(version_mensual, 'comparativo_mensual', construir_fig_mensual)
+    st.plotly_chart(fig_mensual, use_container_width=True)
+
 # ============================================
 # TABLA HOY x HOY - GESTIONES
 # ============================================
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 st.markdown('<h2 class="section-title">📅 Tabla HOY x HOY - Gestiones</h2>', unsafe_allow_html=True)
 
-def cargar_gestiones():
-    import os
-    posibles_rutas = [
-        "ANALISIS WORLDTEL.xlsx",
-        "./ANALISIS WORLDTEL.xlsx",
-        os.path.join(os.getcwd(), "ANALISIS WORLDTEL.xlsx"),
-        r"C:\Users\USUARIO\Desktop\REPORTE MENSUAL WORLDTEL\DASHBOARD ANALISIS\WORLDTEL ANALISIS\ANALISIS WORLDTEL.xlsx"
-    ]
-    
-    for ruta in posibles_rutas:
-        try:
-            if os.path.exists(ruta) and os.path.isfile(ruta):
-                try:
-                    df = pd.read_excel(ruta, sheet_name='GESTIONES', engine='openpyxl')
-                    return df
-                except:
-                    pass
-        except:
-            pass
-    return None
-
-df_gestiones = cargar_gestiones()
+def html_hoy_x_hoy(matriz):
+    """Tabla HTML de la matriz HOY x HOY en orden cronológico.
 
-if df_gestiones is not None and not df_gestiones.empty:
-    # Clasificar gestores por equipo
-    df_gestiones['EQUIPO'] = df_gestiones['GESTOR'].apply(lambda x: 'WORLDTEL' if x in equipo_worldtel else 'GI CORONADO')
+    La grilla arranca con '-' en todas las celdas y solo se formatean y
+    ubican las celdas con promesas; la fila y la columna TOTAL vienen de
+    los totales de la matriz dispersa.
+    """
+    filas, columnas = matriz.filas, matriz.columnas
+    etiquetas = list(columnas.strftime('%d/%m/%y'))
     
-    # Limpiar datos
-    df_gestiones_limpio = df_gestiones[
-        (df_gestiones['FECHA_GESTION'].notna()) &
-        (df_gestiones['FECHA_PROMESA'].notna()) &
-        (df_gestiones['MONTO_PROMESA'].notna()) &
-        (df_gestiones['MONTO_PROMESA'] > 0)
-    ].copy()
+    grilla = np.full((len(filas), len(columnas)), "<span style='color: #ccc;'>-</span>", dtype=object)
+    grilla[
+        filas.get_indexer(matriz.celdas.index.get_level_values(0)),
+        columnas.get_indexer(matriz.celdas.index.get_level_values(1))
+    ] = formato_numero(matriz.celdas).to_numpy()
     
-    if not df_gestiones_limpio.empty:
-        # Filtro por equipo
-        col_filtro = st.columns(1)[0]
-        with col_filtro:
-            filtro_equipo = st.selectbox(
-                "🔍 Filtrar por Equipo",
-                options=['TODOS', 'WORLDTEL', 'GI CORONADO'],
-                index=0,
-                key='selectbox_hoy'
-            )
-        
-        # Aplicar filtro
-        if filtro_equipo != 'TODOS':
-            df_filtrado = df_gestiones_limpio[df_gestiones_limpio['EQUIPO'] == filtro_equipo].copy()
-        else:
-            df_filtrado = df_gestiones_limpio.copy()
-        
-        # Convertir fechas a formato DD/MM/AA
-        df_filtrado['FECHA_GESTION'] = pd.to_datetime(df_filtrado['FECHA_GESTION']).dt.strftime('%d/%m/%y')
-        df_filtrado['FECHA_PROMESA'] = pd.to_datetime(df_filtrado['FECHA_PROMESA']).dt.strftime('%d/%m/%y')
-        
-        # Crear tabla cruzada (pivot table)
-        tabla_cruzada = df_filtrado.pivot_table(
-            index='FECHA_GESTION',
-            columns='FECHA_PROMESA',
-            values='MONTO_PROMESA',
-            aggfunc='sum'
+    vista = pd.DataFrame(grilla, columns=etiquetas)
+    vista.insert(0, 'HOY x HOY', filas.strftime('%d/%m/%y'))
+    vista['TOTAL'] = formato_numero(pd.Series(matriz.total_filas)).to_numpy()
+    fila_total = ['TOTAL'] + list(formato_numero(pd.Series(matriz.total_columnas))) + [f"{matriz.total:,.2f}"]
+    vista.loc[len(vista)] = fila_total
+    
+    clases = pd.Series('normal', index=vista.index)
+    clases.iloc[-1] = 'total'
+    return tabla_html(
+        vista,
+        alineacion={'HOY x HOY': 'center', **dict.fromkeys(etiquetas + ['TOTAL'], 'right')},
+        clases_fila=clases, negrita=['HOY x HOY'], alinear_encabezado='center',
+        relleno='4px', estilo_tabla='border-collapse: collapse; width: 100%; font-size: 0.9em;',
+        estilo_encabezado='background-color: #f0f0f0; font-weight: bold;',
+        contenedor='overflow-x: auto; margin: 20px 0;'
+    )
+
+@st.fragment
+def seccion_hoy_x_hoy(version, motor, fuente_gestiones):
+    # Filtro por equipo
+    col_filtro = st.columns(1)[0]
+    with col_filtro:
+        filtro_equipo = st.selectbox(
+            "🔍 Filtrar por Equipo",
+            options=['TODOS', 'WORLDTEL', 'GI CORONADO'],
+            index=0,
+            key='selectbox_hoy'
         )
-        
-        # Agregar totales
-        tabla_cruzada['TOTAL'] = tabla_cruzada.sum(axis=1)
-        totales_columnas = tabla_cruzada.sum(axis=0)
-        totales_columnas.name = 'TOTAL'
-        tabla_cruzada = pd.concat([tabla_cruzada, totales_columnas.to_frame().T])
-        
-        # Rellenar NaN con 0 y redondear a 2 decimales
-        tabla_cruzada = tabla_cruzada.fillna(0).round(2)
-        
-        # Crear tabla HTML mejorada
-        html_tabla_hoy = "<div style='overflow-x: auto; margin: 20px 0;'><table style='border-collapse: collapse; width: 100%; font-size: 0.9em;'>"
-        
-        # Encabezados
-        html_tabla_hoy += "<tr style='background-color: #f0f0f0;'><th style='border: 1px solid #ddd; padding: 4px; text-align: center; font-weight: bold;'>HOY x HOY</th>"
-        for col in tabla_cruzada.columns:
-            html_tabla_hoy += f"<th style='border: 1px solid #ddd; padding: 4px; text-align: center; font-weight: bold;'>{col}</th>"
-        html_tabla_hoy += "</tr>"
-        
-        # Datos
-        for idx, row in tabla_cruzada.iterrows():
-            if idx == 'TOTAL':
-                # Fila de totales
-                html_tabla_hoy += f"<tr style='background-color: #e8f4f8; font-weight: bold;'><td style='border: 1px solid #ddd; padding: 4px; text-align: center;'>{idx}</td>"
-                for val in row:
-                    html_tabla_hoy += f"<td style='border: 1px solid #ddd; padding: 4px; text-align: right;'>{val:,.2f}</td>"
-                html_tabla_hoy += "</tr>"
-            else:
-                # Filas normales
-                html_tabla_hoy += f"<tr><td style='border: 1px solid #ddd; padding: 4px; text-align: center; font-weight: bold;'>{idx}</td>"
-                for val in row:
-                    if val == 0:
-                        html_tabla_hoy += f"<td style='border: 1px solid #ddd; padding: 4px; text-align: right; color: #ccc;'>-</td>"
-                    else:
-                        html_tabla_hoy += f"<td style='border: 1px solid #ddd; padding: 4px; text-align: right;'>{val:,.2f}</td>"
-                html_tabla_hoy += "</tr>"
-        
-        html_tabla_hoy += "</table></div>"
-        st.markdown(html_tabla_hoy, unsafe_allow_html=True)
+
+    # Matriz dispersa (fecha de gestión x fecha de promesa) con sus totales
+    matriz_hoy = _matriz_hoy_x_hoy(
+        version, motor, None if filtro_equipo == 'TODOS' else filtro_equipo, fuente_gestiones
+    )
+    html_tabla_hoy = html_hoy_x_hoy(matriz_hoy)
+    st.markdown(html_tabla_hoy, unsafe_allow_html=True)
+
+if df_gestiones is not None and not df_gestiones.empty:
+    if not df_gestiones_limpio.empty:
+        seccion_hoy_x_hoy(version_datos, motor, conexion_duckdb if motor == MOTOR_DUCKDB else df_gestiones_limpio)
     else:
         st.warning("No hay datos válidos en la hoja GESTIONES")
 else:
@@ -678,23 +884,12 @@ st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 st.markdown('<h2 class="section-title">📈 Análisis de Efectividad y Conversión</h2>', unsafe_allow_html=True)
 
 # Calcular totales de cada equipo
-monto_worldtel_recaudado = df[df['EQUIPO'] == 'WORLDTEL']['MONTO'].sum()
-monto_gi_recaudado = df[df['EQUIPO'] == 'GI CORONADO']['MONTO'].sum()
+recaudado_equipos = analisis.recaudado_por_equipo(df)
+monto_worldtel_recaudado = recaudado_equipos['WORLDTEL']
+monto_gi_recaudado = recaudado_equipos['GI CORONADO']
 
-# Calcular promesas por equipo desde HOY x HOY
-if df_gestiones is not None and not df_gestiones.empty:
-    df_gestiones['EQUIPO'] = df_gestiones['GESTOR'].apply(lambda x: 'WORLDTEL' if x in equipo_worldtel else 'GI CORONADO')
-    
-    df_gestiones_limpio = df_gestiones[
-        (df_gestiones['FECHA_GESTION'].notna()) &
-        (df_gestiones['FECHA_PROMESA'].notna()) &
-        (df_gestiones['MONTO_PROMESA'].notna()) &
-        (df_gestiones['MONTO_PROMESA'] > 0)
-    ].copy()
-    
-    monto_promesas_worldtel = df_gestiones_limpio[df_gestiones_limpio['EQUIPO'] == 'WORLDTEL']['MONTO_PROMESA'].sum()
-    monto_promesas_gi = df_gestiones_limpio[df_gestiones_limpio['EQUIPO'] == 'GI CORONADO']['MONTO_PROMESA'].sum()
-    
+@st.fragment
+def seccion_efectividad(monto_worldtel_recaudado, monto_gi_recaudado, monto_promesas_worldtel, monto_promesas_gi):
     # Filtro para la sección de análisis
     col_filtro_analisis = st.columns(1)[0]
     with col_filtro_analisis:
@@ -711,15 +906,10 @@ if df_gestiones is not None and not df_gestiones.empty:
         
         col1, col2, col3, col4 = st.columns(4)
         
-        monto_recaudado = monto_worldtel_recaudado
-        monto_promesas = monto_promesas_worldtel
-        monto_total_proyectado = monto_recaudado + monto_promesas
-        
-        # Calcular % de conversión
-        if monto_total_proyectado > 0:
-            porcentaje_conversion = (monto_recaudado / monto_total_proyectado) * 100
-        else:
-            porcentaje_conversion = 0
+        # Recaudado, promesas, total proyectado y % de conversión
+        monto_recaudado, monto_promesas, monto_total_proyectado, porcentaje_conversion = (
+            analisis.metricas_efectividad(monto_worldtel_recaudado, monto_promesas_worldtel)
+        )
         
         with col1:
             st.markdown(f"""
@@ -759,15 +949,10 @@ if df_gestiones is not None and not df_gestiones.empty:
         
         col1, col2, col3, col4 = st.columns(4)
         
-        monto_recaudado = monto_gi_recaudado
-        monto_promesas = monto_promesas_gi
-        monto_total_proyectado = monto_recaudado + monto_promesas
-        
-        # Calcular % de conversión
-        if monto_total_proyectado > 0:
-            porcentaje_conversion = (monto_recaudado / monto_total_proyectado) * 100
-        else:
-            porcentaje_conversion = 0
+        # Recaudado, promesas, total proyectado y % de conversión
+        monto_recaudado, monto_promesas, monto_total_proyectado, porcentaje_conversion = (
+            analisis.metricas_efectividad(monto_gi_recaudado, monto_promesas_gi)
+        )
         
         with col1:
             st.markdown(f"""
@@ -801,6 +986,12 @@ if df_gestiones is not None and not df_gestiones.empty:
                     <div class="metric-value" style="color: {color_conversion};">{porcentaje_conversion:.1f}%</div>
                 </div>
             """, unsafe_allow_html=True)
+
+# Calcular promesas por equipo desde HOY x HOY
+if df_gestiones is not None and not df_gestiones.empty:
+    promesas_equipos = analisis.promesas_por_equipo(df_gestiones_limpio)
+    seccion_efectividad(monto_worldtel_recaudado, monto_gi_recaudado,
+                        promesas_equipos['WORLDTEL'], promesas_equipos['GI CORONADO'])
 else:
     st.info("No se pueden calcular métricas sin datos de GESTIONES")
 
@@ -810,26 +1001,15 @@ else:
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 st.markdown('<h2 class="section-title">📈 EVOLUCIÓN DE PAGOS Y AVANCE DÍA A DÍA</h2>', unsafe_allow_html=True)
 
-# Preparar datos de evolución de pagos
-df_fecha_equipo = df.copy()
-df_fecha_equipo = df_fecha_equipo[df_fecha_equipo['FECHA_DE_PAGO'].notna()].copy()
-
-# Convertir fechas y crear columna de fecha sin hora
-df_fecha_equipo['FECHA'] = pd.to_datetime(df_fecha_equipo['FECHA_DE_PAGO']).dt.normalize()
-
-# Agrupar por fecha y equipo
-evolucion_pagos = df_fecha_equipo.groupby(['FECHA', 'EQUIPO']).agg({
-    'MONTO': 'sum'
-}).reset_index()
-
-# Renombrar columna de monto
-evolucion_pagos.columns = ['FECHA', 'EQUIPO', 'MONTO_DIARIO']
-
-# Sortear por fecha
-evolucion_pagos = evolucion_pagos.sort_values('FECHA')
+# Pagos y gestiones indexados por día una vez por versión de datos: elegir
+# una fecha es un corte de filas, sin convertir ni comparar columnas enteras
+indice_pagos = _indice_por_dia(version_datos, 'FECHA_DE_PAGO', df)
+indice_gestiones = None
+if df_gestiones is not None and not df_gestiones.empty:
+    indice_gestiones = _indice_por_dia(version_datos, 'FECHA_GESTION', df_gestiones)
 
-# Calcular acumulado por equipo
-evolucion_pagos['MONTO_ACUMULADO'] = evolucion_pagos.groupby('EQUIPO')['MONTO_DIARIO'].cumsum()
+# evolucion_pagos (MONTO_DIARIO y MONTO_ACUMULADO por fecha y equipo) viene
+# de agregados_pagos, que la actualiza solo con los pagos agregados
 
 # Tabs para las dos vistas
 tab_evolucion, tab_avance = st.tabs([
@@ -841,56 +1021,60 @@ with tab_evolucion:
     st.markdown("### Evolución Acumulada de Pagos por Equipo")
     
     # Crear gráfico de línea con evolución acumulada
-    fig_evolucion = px.line(
-        evolucion_pagos,
-        x='FECHA',
-        y='MONTO_ACUMULADO',
-        color='EQUIPO',
-        title='Evolución Acumulada de Pagos - WORLDTEL vs GI CORONADO',
-        markers=True,
-        color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
-        labels={'FECHA': 'Fecha', 'MONTO_ACUMULADO': 'Monto Acumulado (S/)', 'EQUIPO': 'Equipo'}
-    )
-    
-    fig_evolucion.update_layout(
-        height=500,
-        hovermode='x unified',
-        plot_bgcolor='rgba(240, 240, 240, 0.5)',
-        paper_bgcolor='white'
-    )
+    def construir_fig_evolucion():
+        fig_evolucion = px.line(
+            evolucion_pagos,
+            x='FECHA',
+            y='MONTO_ACUMULADO',
+            color='EQUIPO',
+            title='Evolución Acumulada de Pagos - WORLDTEL vs GI CORONADO',
+            markers=True,
+            color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
+            labels={'FECHA': 'Fecha', 'MONTO_ACUMULADO': 'Monto Acumulado (S/)', 'EQUIPO': 'Equipo'}
+        )
     
-    fig_evolucion.update_traces(
-        line=dict(width=3),
-        marker=dict(size=8)
-    )
+        fig_evolucion.update_layout(
+            height=500,
+            hovermode='x unified',
+            plot_bgcolor='rgba(240, 240, 240, 0.5)',
+            paper_bgcolor='white'
+        )
     
+        fig_evolucion.update_traces(
+            line=dict(width=3),
+            marker=dict(size=8)
+        )
+        return fig_evolucion
+    fig_evolucion = figura_cacheada(version_figuras, 'evolucion_acumulada', construir_fig_evolucion)
     st.plotly_chart(fig_evolucion, use_container_width=True)
     
     # Gráfico de barras diarias comparativas
     st.markdown("### Pagos Diarios Comparativos")
+    def construir_fig_barras():
+        fig_barras = px.bar(
+            evolucion_pagos,
+            x='FECHA',
+            y='MONTO_DIARIO',
+            color='EQUIPO',
+            title='Monto de Pagos Diarios por Equipo',
+            color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
+            labels={'FECHA': 'Fecha', 'MONTO_DIARIO': 'Monto Diario (S/)', 'EQUIPO': 'Equipo'},
+            barmode='group'
+        )
     
-    fig_barras = px.bar(
-        evolucion_pagos,
-        x='FECHA',
-        y='MONTO_DIARIO',
-        color='EQUIPO',
-        title='Monto de Pagos Diarios por Equipo',
-        color_discrete_map={'WORLDTEL': '#1f77b4', 'GI CORONADO': '#ff7f0e'},
-        labels={'FECHA': 'Fecha', 'MONTO_DIARIO': 'Monto Diario (S/)', 'EQUIPO': 'Equipo'},
-        barmode='group'
-    )
-    
-    fig_barras.update_layout(
-        height=450,
-        hovermode='x unified',
-        plot_bgcolor='rgba(240, 240, 240, 0.5)'
-    )
-    
-    fig_barras.update_traces(marker_line_width=1.5, marker_line_color='white')
+        fig_barras.update_layout(
+            height=450,
+            hovermode='x unified',
+            plot_bgcolor='rgba(240, 240, 240, 0.5)'
+        )
     
+        fig_barras.update_traces(marker_line_width=1.5, marker_line_color='white')
+        return fig_barras
+    fig_barras = figura_cacheada(version_figuras, 'pagos_diarios', construir_fig_barras)
     st.plotly_chart(fig_barras, use_container_width=True)
 
-with tab_avance:
+@st.fragment
+def seccion_avance_dia(evolucion_pagos, indice_pagos, indice_gestiones, motor, fuente_resumen):
     st.markdown("### Avance de Pagos Día a Día")
     
     # Selector de fecha
@@ -907,34 +1091,21 @@ with tab_avance:
         )
     
     # Filtrar datos del día seleccionado
-    df_dia_seleccionado = df_fecha_equipo[
-        pd.to_datetime(df_fecha_equipo['FECHA_DE_PAGO']).dt.date == fecha_seleccionada.date()
-    ].copy()
+    df_dia_seleccionado = analisis.filas_del_dia(indice_pagos, fecha_seleccionada)
     
-    # Filtrar gestiones del día seleccionado
-    df_gestiones_dia = None
-    gestiones_worldtel = 0
-    gestiones_gi = 0
-    
-    if df_gestiones is not None and not df_gestiones.empty:
-        df_gestiones['EQUIPO'] = df_gestiones['GESTOR'].apply(lambda x: 'WORLDTEL' if x in equipo_worldtel else 'GI CORONADO')
-        df_gestiones_dia = df_gestiones[
-            (df_gestiones['FECHA_GESTION'].notna()) &
-            (pd.to_datetime(df_gestiones['FECHA_GESTION']).dt.date == fecha_seleccionada.date())
-        ].copy()
-        
-        gestiones_worldtel = len(df_gestiones_dia[df_gestiones_dia['EQUIPO'] == 'WORLDTEL'])
-        gestiones_gi = len(df_gestiones_dia[df_gestiones_dia['EQUIPO'] == 'GI CORONADO'])
+    # Gestiones del día seleccionado por equipo
+    gestiones_dia = {}
+    if indice_gestiones is not None:
+        gestiones_dia = analisis.gestiones_del_dia(indice_gestiones, fecha_seleccionada)
+    gestiones_worldtel = gestiones_dia.get('WORLDTEL', 0)
+    gestiones_gi = gestiones_dia.get('GI CORONADO', 0)
     
     if not df_dia_seleccionado.empty:
         # Crear tabla resumen por equipo del día
-        resumen_dia = df_dia_seleccionado.groupby('EQUIPO').agg({
-            'MONTO': ['sum', 'count'],
-            'RAZON_SOCIAL': 'nunique'
-        }).reset_index()
-        
-        resumen_dia.columns = ['EQUIPO', 'MONTO_TOTAL', 'CANTIDAD_PAGOS', 'CANTIDAD_CLIENTES']
-        resumen_dia = resumen_dia.sort_values('MONTO_TOTAL', ascending=False)
+        if motor == MOTOR_DUCKDB:
+            resumen_dia = consultas_duckdb.resumen_dia(fuente_resumen, fecha_seleccionada)
+        else:
+            resumen_dia = analisis.resumen_dia(fuente_resumen, fecha_seleccionada)
         
         # Mostrar métricas del día
         st.markdown(f"#### Resumen de Pagos del {fecha_seleccionada.strftime('%d de %B de %Y')}")
@@ -1098,55 +1269,59 @@ with tab_avance:
         # Tabla detallada de pagos del día
         st.markdown("#### Detalle de Pagos del Día")
         
-        # Preparar tabla detallada
-        df_detalle_dia = df_dia_seleccionado[[
-            'ASESOR', 'EQUIPO', 'RAZON_SOCIAL', 'CARTERA', 'MONTO', 'NUMERO_FACTURA'
-        ]].sort_values(['EQUIPO', 'MONTO'], ascending=[True, False]).copy()
-        
-        df_detalle_dia['MONTO'] = df_detalle_dia['MONTO'].apply(lambda x: f"S/ {x:,.2f}")
-        
-        # Crear tabla HTML personalizada
-        html_tabla_detalle_dia = "<table style='width:100%; border-collapse: collapse; font-size: 0.85em;'>"
-        html_tabla_detalle_dia += "<tr style='background-color: #e8e8e8; font-weight: bold;'>"
-        html_tabla_detalle_dia += "<th style='padding: 8px; border: 1px solid #ddd; text-align: left;'>Asesor</th>"
-        html_tabla_detalle_dia += "<th style='padding: 8px; border: 1px solid #ddd; text-align: center;'>Equipo</th>"
-        html_tabla_detalle_dia += "<th style='padding: 8px; border: 1px solid #ddd; text-align: left;'>Razón Social</th>"
-        html_tabla_detalle_dia += "<th style='padding: 8px; border: 1px solid #ddd; text-align: left;'>Cartera</th>"
-        html_tabla_detalle_dia += "<th style='padding: 8px; border: 1px solid #ddd; text-align: right;'>Monto</th>"
-        html_tabla_detalle_dia += "<th style='padding: 8px; border: 1px solid #ddd; text-align: center;'>Factura</th>"
-        html_tabla_detalle_dia += "</tr>"
-        
-        for idx, row in df_detalle_dia.iterrows():
-            color_equipo = "#e3f2fd" if row['EQUIPO'] == 'WORLDTEL' else "#fff3e0"
-            html_tabla_detalle_dia += f"<tr style='background-color: {color_equipo};'>"
-            html_tabla_detalle_dia += f"<td style='padding: 8px; border: 1px solid #ddd;'>{row['ASESOR']}</td>"
-            html_tabla_detalle_dia += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: center;'><strong>{row['EQUIPO']}</strong></td>"
-            html_tabla_detalle_dia += f"<td style='padding: 8px; border: 1px solid #ddd;'>{row['RAZON_SOCIAL']}</td>"
-            html_tabla_detalle_dia += f"<td style='padding: 8px; border: 1px solid #ddd;'>{row['CARTERA']}</td>"
-            html_tabla_detalle_dia += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: right;'><strong>{row['MONTO']}</strong></td>"
-            html_tabla_detalle_dia += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{row['NUMERO_FACTURA']}</td>"
-            html_tabla_detalle_dia += "</tr>"
+        # Preparar tabla detallada (montos sin formatear para poder ordenar)
+        df_detalle_dia = analisis.detalle_dia(df_dia_seleccionado)
+        
+        def html_detalle_dia(filas):
+            """Página del detalle como tabla HTML, con el color de fondo de cada equipo"""
+            return tabla_html(
+                filas.assign(MONTO=formato_moneda(filas['MONTO'])),
+                {'ASESOR': 'Asesor', 'EQUIPO': 'Equipo', 'RAZON_SOCIAL': 'Razón Social',
+                 'CARTERA': 'Cartera', 'MONTO': 'Monto', 'NUMERO_FACTURA': 'Factura'},
+                alineacion={'EQUIPO': 'center', 'MONTO': 'right', 'NUMERO_FACTURA': 'center'},
+                clases_fila=(filas['EQUIPO'] == 'WORLDTEL').map({True: 'worldtel', False: 'gi'}),
+                negrita=['EQUIPO', 'MONTO'],
+                estilo_tabla='width:100%; border-collapse: collapse; font-size: 0.85em;'
+            )
         
-        html_tabla_detalle_dia += "</table>"
-        st.markdown(html_tabla_detalle_dia, unsafe_allow_html=True)
+        mostrar_tabla_paginada(
+            'detalle_dia',
+            {
+                'Equipo y monto': (['EQUIPO', 'MONTO'], [True, False]),
+                'Monto (mayor a menor)': (['MONTO'], [False]),
+                'Monto (menor a mayor)': (['MONTO'], [True]),
+                'Asesor': (['ASESOR', 'MONTO'], [True, False]),
+                'Razón Social': (['RAZON_SOCIAL', 'MONTO'], [True, False]),
+                'Cartera': (['CARTERA', 'MONTO'], [True, False])
+            },
+            lambda texto, orden, ascendente: analisis.filtrar_detalle(
+                df_detalle_dia, texto, ['ASESOR', 'RAZON_SOCIAL', 'CARTERA', 'NUMERO_FACTURA'], orden, ascendente
+            ),
+            html_detalle_dia, unidad='pagos'
+        )
     
     else:
         st.warning(f"No hay pagos registrados para la fecha {fecha_seleccionada.strftime('%d/%m/%Y')}")
 
+with tab_avance:
+    seccion_avance_dia(evolucion_pagos, indice_pagos, indice_gestiones, motor,
+                       conexion_duckdb if motor == MOTOR_DUCKDB else cubo_pagos)
+
 # ============================================
 # SECCIÓN TIMMING - GASTOS
 # ============================================
 st.markdown('<div class="divider"></div>', unsafe_allow_html=True)
 st.markdown('<h2 class="section-title">⏱️ ANÁLISIS DE TIMMING - GASTOS</h2>', unsafe_allow_html=True)
 
+@st.cache_data(show_spinner=False, max_entries=2)
+def _leer_timming(huella, hoja):
+    """Tablas de timming validadas de una versión del libro (hoja usada, TablasTimming)"""
+    nombre_hoja, bloques = leer_timming(huella[0], tuple(analisis.TITULOS_TIMMING.values()),
+                                        len(analisis.ENCABEZADOS_TIMMING), hoja)
+    return nombre_hoja, analisis.tablas_timming(bloques)
+
 def cargar_timming():
-    import os
-    
-    # Obtener el directorio donde está el dashboard
-    dir_actual = os.path.dirname(os.path.abspath(__file__))
-    
-    # Buscar el archivo TIMMING en el mismo directorio
-    ruta_timming = os.path.join(dir_actual, 'TIMMING WORLDTEL SET - OCT 2025.xlsx')
+    ruta_timming = RUTA_TIMMING
     
     if not os.path.exists(ruta_timming):
         st.error(f"❌ No se encontró el archivo TIMMING")
@@ -1154,9 +1329,8 @@ def cargar_timming():
         return None
     
     try:
-        # Leer la hoja TIMMING NOVIEMBRE sin headers
-        df_timming = pd.read_excel(ruta_timming, sheet_name='TIMMING NOVIEMBRE', engine='openpyxl', header=None)
-        return df_timming
+        # Solo las celdas de las 4 tablas, ubicadas por sus títulos
+        return _leer_timming(huella_archivo(ruta_timming), HOJA_TIMMING)
     except PermissionError:
         st.error("❌ El archivo está siendo utilizado por otra aplicación")
         st.warning("⚠️ Por favor, cierra el archivo Excel y luego recarga la página")
@@ -1165,106 +1339,47 @@ def cargar_timming():
         st.error(f"Error al cargar timming: {str(e)}")
         return None
 
-def parsear_timming_data(df_timming):
-    """Parsea las 4 tablas del archivo timming"""
-    tablas = {}
-    
-    try:
-        # GASTOS GENERAL (columnas 1-5, filas 2-23)
-        datos_gg = df_timming.iloc[2:23, 1:6].copy()
-        datos_gg.columns = ['Día hábil', 'Fecha', 'Timing', 'Meta día', 'Acumulado']
-        datos_gg = datos_gg[pd.to_numeric(datos_gg['Día hábil'], errors='coerce').notna()].copy()
-        datos_gg = datos_gg.reset_index(drop=True)
-        tablas['GASTOS_GENERAL'] = datos_gg
-    except:
-        tablas['GASTOS_GENERAL'] = None
-    
-    try:
-        # GASTOS ASESOR (columnas 7-11, filas 2-23)
-        datos_ga = df_timming.iloc[2:23, 7:12].copy()
-        datos_ga.columns = ['Día hábil', 'Fecha', 'Timing', 'Meta día', 'Acumulado']
-        datos_ga = datos_ga[pd.to_numeric(datos_ga['Día hábil'], errors='coerce').notna()].copy()
-        datos_ga = datos_ga.reset_index(drop=True)
-        tablas['GASTOS_ASESOR'] = datos_ga
-    except:
-        tablas['GASTOS_ASESOR'] = None
-    
-    try:
-        # PLANILLAS GENERAL (columnas 1-5, filas 28-49)
-        datos_pg = df_timming.iloc[28:49, 1:6].copy()
-        datos_pg.columns = ['Día hábil', 'Fecha', 'Timing', 'Meta día', 'Acumulado']
-        datos_pg = datos_pg[pd.to_numeric(datos_pg['Día hábil'], errors='coerce').notna()].copy()
-        datos_pg = datos_pg.reset_index(drop=True)
-        tablas['PLANILLAS_GENERAL'] = datos_pg
-    except:
-        tablas['PLANILLAS_GENERAL'] = None
-    
-    try:
-        # PLANILLAS ASESOR (columnas 7-11, filas 28-49)
-        datos_pa = df_timming.iloc[28:49, 7:12].copy()
-        datos_pa.columns = ['Día hábil', 'Fecha', 'Timing', 'Meta día', 'Acumulado']
-        datos_pa = datos_pa[pd.to_numeric(datos_pa['Día hábil'], errors='coerce').notna()].copy()
-        datos_pa = datos_pa.reset_index(drop=True)
-        tablas['PLANILLAS_ASESOR'] = datos_pa
-    except:
-        tablas['PLANILLAS_ASESOR'] = None
-    
-    return tablas
+def tabla_visual_timming(datos):
+    """Tabla de timming con las columnas ya formateadas para mostrar"""
+    tabla_visual = datos[['Día hábil', 'Fecha', 'Timing', 'Meta día', 'Acumulado']].copy()
+    tabla_visual['Día hábil'] = tabla_visual['Día hábil'].astype(int)
+    tabla_visual['Fecha'] = tabla_visual['Fecha'].dt.strftime('%d-%b-%Y')
+    tabla_visual['Timing'] = formato_porcentaje(tabla_visual['Timing'])
+    tabla_visual['Meta día'] = formato_moneda(tabla_visual['Meta día'])
+    tabla_visual['Acumulado'] = formato_moneda(tabla_visual['Acumulado'])
+    return tabla_visual
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _preparar_timming(version, _tablas):
+    """Por versión de las tablas de timming: clave -> (TablaTimming, tabla formateada),
+    o None si la tabla falta o está vacía"""
+    preparadas = {}
+    for clave, datos in _tablas.items():
+        if datos is None or datos.empty:
+            preparadas[clave] = None
+            continue
+        tabla = analisis.preparar_timming(datos)
+        preparadas[clave] = (tabla, tabla_visual_timming(tabla.datos))
+    return preparadas
 
-def mostrar_tabla_timming(datos, titulo, monto_recaudado_worldtel=None, es_asesor=False, nombre_asesor=None, df_cierre=None):
+def mostrar_tabla_timming(preparada, titulo, monto_recaudado_worldtel=None, es_asesor=False):
     """Muestra tabla de timming con análisis del día actual
     
     Args:
-        datos: DataFrame con datos de timming
+        preparada: (TablaTimming, tabla formateada) de _preparar_timming
         titulo: Título de la tabla
-        monto_recaudado_worldtel: Monto recaudado total (por defecto)
+        monto_recaudado_worldtel: Monto recaudado (del equipo, o del asesor si es_asesor)
         es_asesor: True si es una tabla de asesor
-        nombre_asesor: Nombre del asesor específico
-        df_cierre: DataFrame de CIERRE DE PAGOS para buscar recaudado por asesor
     """
-    if datos is None or datos.empty:
+    if preparada is None:
         st.warning(f"No hay datos para {titulo}")
         return
     
     try:
-        from datetime import datetime
-        
-        # Limpiar y convertir datos
-        datos = datos.copy()
-        
-        # Convertir columnas numéricas
-        datos['Día hábil'] = pd.to_numeric(datos['Día hábil'], errors='coerce')
-        datos['Timing'] = pd.to_numeric(datos['Timing'], errors='coerce')
-        datos['Meta día'] = pd.to_numeric(datos['Meta día'], errors='coerce')
-        datos['Acumulado'] = pd.to_numeric(datos['Acumulado'], errors='coerce')
-        
-        # Convertir fechas
-        datos['Fecha'] = pd.to_datetime(datos['Fecha'], errors='coerce')
-        
-        # Obtener el día actual (fecha del sistema)
-        from datetime import date
-        hoy = datetime.combine(date.today(), datetime.min.time())
-        
-        # Buscar la fila del día actual basado en la fecha
-        fila_hoy = None
-        acumulado_hoy = 0
-        meta_acumulada_hoy = 0
-        
-        for idx, row in datos.iterrows():
-            fecha = row['Fecha']
-            if pd.notna(fecha):
-                if fecha.date() == hoy.date():
-                    acumulado_hoy = row['Acumulado'] if pd.notna(row['Acumulado']) else 0
-                    meta_acumulada_hoy = row['Meta día'] if pd.notna(row['Meta día']) else 0
-                    fila_hoy = idx
-                    break
-        
-        # Calcular el recaudado específico si es por asesor
+        # Fila del día actual (fecha del sistema) y acumulado esperado a hoy
+        tabla, tabla_visual = preparada
+        datos, fila_hoy, acumulado_hoy, meta_acumulada_hoy = analisis.avance_timming(tabla)
         monto_recaudado_actual = monto_recaudado_worldtel
-        if es_asesor and nombre_asesor and df_cierre is not None:
-            # Buscar el recaudado del asesor específico desde CIERRE DE PAGOS
-            monto_asesor = df_cierre[df_cierre['ASESOR'] == nombre_asesor]['MONTO'].sum()
-            monto_recaudado_actual = monto_asesor if monto_asesor > 0 else monto_recaudado_worldtel
         
         # Mostrar métricas principales
         col1, col2, col3, col4 = st.columns(4)
@@ -1357,46 +1472,109 @@ def mostrar_tabla_timming(datos, titulo, monto_recaudado_worldtel=None, es_aseso
         # Crear tabla visual
         st.markdown(f"### Detalle de {titulo}")
         
-        # Preparar datos para tabla
-        tabla_visual = datos[['Día hábil', 'Fecha', 'Timing', 'Meta día', 'Acumulado']].copy()
-        tabla_visual['Día hábil'] = tabla_visual['Día hábil'].astype(int)
-        tabla_visual['Fecha'] = tabla_visual['Fecha'].dt.strftime('%d-%b-%Y')
-        tabla_visual['Timing'] = tabla_visual['Timing'].apply(lambda x: f"{x*100:.2f}%" if pd.notna(x) else "-")
-        tabla_visual['Meta día'] = tabla_visual['Meta día'].apply(lambda x: f"S/ {x:,.2f}" if pd.notna(x) else "-")
-        tabla_visual['Acumulado'] = tabla_visual['Acumulado'].apply(lambda x: f"S/ {x:,.2f}" if pd.notna(x) else "-")
-        
-        # Mostrar tabla con alternancia de colores para el día actual
-        html_tabla = "<table style='width:100%; border-collapse: collapse; font-size: 0.85em;'>"
-        html_tabla += "<tr style='background-color: #e8e8e8; font-weight: bold;'>"
-        for col in tabla_visual.columns:
-            html_tabla += f"<th style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{col}</th>"
-        html_tabla += "</tr>"
-        
-        for idx, row in tabla_visual.iterrows():
-            if idx == fila_hoy:
-                bg_color = "#fffacd"
-                font_weight = "bold"
-            else:
-                bg_color = "#ffffff"
-                font_weight = "normal"
-            
-            html_tabla += f"<tr style='background-color: {bg_color}; font-weight: {font_weight};'>"
-            for col in tabla_visual.columns:
-                html_tabla += f"<td style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{row[col]}</td>"
-            html_tabla += "</tr>"
-        
-        html_tabla += "</table>"
+        # Mostrar tabla resaltando el día actual
+        clases_timming = pd.Series('normal', index=tabla_visual.index).where(tabla_visual.index != fila_hoy, 'resaltado')
+        html_tabla = tabla_html(
+            tabla_visual, alineacion=dict.fromkeys(tabla_visual.columns, 'center'), clases_fila=clases_timming,
+            estilo_tabla='width:100%; border-collapse: collapse; font-size: 0.85em;'
+        )
         st.markdown(html_tabla, unsafe_allow_html=True)
         
     except Exception as e:
         st.error(f"Error al mostrar tabla: {str(e)}")
 
-# Cargar y procesar datos de timming
-df_timming_raw = cargar_timming()
+@st.cache_data(show_spinner=False, max_entries=4)
+def _avance_asesores(version, version_timming, hoy, asesores, _df, _tabla):
+    """Avance vs timming de todos los asesores, por versión de datos y día"""
+    return analisis.avance_asesores(_df, list(asesores), _tabla, hoy)
+
+# Orden del ranking de asesores: opción -> (columna, ascendente)
+ORDENES_RANKING = {
+    '% Avance': ('AVANCE', False),
+    'Recaudado': ('RECAUDADO', False),
+    'Diferencia (falta)': ('DIFERENCIA', False),
+    'Asesor': ('ASESOR', True)
+}
+
+def mostrar_ranking_asesores(ranking, asesor_seleccionado, orden):
+    """Tabla de avance vs timming de todos los asesores, resaltando el seleccionado"""
+    columna, ascendente = ORDENES_RANKING[orden]
+    ranking = ranking.sort_values(columna, ascending=ascendente, na_position='last', kind='stable').reset_index(drop=True)
+    vista = pd.DataFrame({
+        '#': range(1, len(ranking) + 1),
+        'Asesor': ranking['ASESOR'],
+        'Recaudado': formato_moneda(ranking['RECAUDADO']),
+        'Timming a hoy': formato_moneda(ranking['META_HOY']),
+        'Diferencia': formato_moneda(ranking['DIFERENCIA']),
+        '% Avance': formato_porcentaje(ranking['AVANCE'] / 100)
+    })
+    clases = pd.Series('normal', index=vista.index).where(ranking['ASESOR'] != asesor_seleccionado, 'resaltado')
+    alineacion = {col: 'right' for col in ['Recaudado', 'Timming a hoy', 'Diferencia', '% Avance']}
+    alineacion.update({'#': 'center', 'Asesor': 'left'})
+    st.markdown(tabla_html(vista, alineacion=alineacion, clases_fila=clases,
+                           estilo_tabla='width:100%; border-collapse: collapse; font-size: 0.85em;'),
+                unsafe_allow_html=True)
+
+@st.fragment
+def seccion_timming_asesores(version, version_timming, asesores_worldtel, df, preparada_asesor):
+    # Selector de asesor para esta pestaña
+    asesor_seleccionado = st.selectbox(
+        "Selecciona un Asesor",
+        options=asesores_worldtel,
+        key="asesor_gastos"
+    )
+    
+    # Avance de todo el equipo calculado de una vez; el detalle toma la fila del asesor
+    monto_asesor = None
+    if preparada_asesor is not None:
+        ranking_asesores = _avance_asesores(
+            version, version_timming, datetime.now().date(), tuple(asesores_worldtel),
+            df, preparada_asesor[0]
+        )
+        st.markdown("##### 🏆 Ranking de asesores vs timming")
+        orden_ranking = st.selectbox("Ordenar por", options=list(ORDENES_RANKING), key="orden_ranking_timming")
+        mostrar_ranking_asesores(ranking_asesores, asesor_seleccionado, orden_ranking)
+        fila_asesor = ranking_asesores[ranking_asesores['ASESOR'] == asesor_seleccionado]
+        monto_asesor = fila_asesor['RECAUDADO'].iloc[0] if len(fila_asesor) else None
+    
+    mostrar_tabla_timming(
+        preparada_asesor, 
+        "Gastos por Asesor",
+        monto_recaudado_worldtel=monto_asesor,
+        es_asesor=True
+    )
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _archivar_timming(huella, _tablas):
+    """Guarda las tablas de timming en el histórico, en el periodo de sus fechas"""
+    fechas = [tabla['Fecha'] for tabla in _tablas.values() if tabla is not None]
+    periodo = historial.periodo_dominante(pd.concat(fechas)) if fechas else None
+    if periodo is not None:
+        historial.guardar_timming(RUTA_HISTORIAL, periodo, _tablas, origen=huella[0])
+    return periodo
+
+# Cargar y procesar datos de timming: del archivo para el libro actual, del
+# histórico para un periodo guardado
+tablas_timming = None
+if es_historico:
+    version_timming = historial.version_periodo(RUTA_HISTORIAL, periodo_elegido, 'timming')
+    tablas_timming = historial.leer_timming(RUTA_HISTORIAL, periodo_elegido)
+else:
+    version_timming = huella_archivo(RUTA_TIMMING) if os.path.exists(RUTA_TIMMING) else None
+    timming = cargar_timming()
+    if timming is not None:
+        hoja_leida, (tablas_timming, problemas_timming) = timming
+        st.caption(f"📄 Hoja: {hoja_leida}")
+        for problema in problemas_timming:
+            st.warning(f"⚠️ {problema}")
+        try:
+            _archivar_timming(huella_archivo(RUTA_TIMMING), tablas_timming)
+        except sqlite3.Error as e:
+            st.sidebar.warning(f"⚠️ No se pudo guardar el timming en el histórico: {str(e)}")
 
-if df_timming_raw is not None:
-    # Extraer las 4 tablas
-    tablas_timming = parsear_timming_data(df_timming_raw)
+if tablas_timming is not None:
+    # Curva de metas y tabla formateada, una vez por versión
+    timming_preparado = _preparar_timming(version_timming, tablas_timming)
     
     # Crear tabs para las 2 tablas de gastos
     tab1, tab2 = st.tabs([
@@ -1407,30 +1585,15 @@ if df_timming_raw is not None:
     # Mostrar cada tabla en su tab
     with tab1:
         st.markdown("#### 📊 TIMMING GENERAL GASTOS ADMINISTRATIVOS")
-        mostrar_tabla_timming(tablas_timming.get('GASTOS_GENERAL'), "Gastos General", monto_worldtel_recaudado)
+        mostrar_tabla_timming(timming_preparado.get('GASTOS_GENERAL'), "Gastos General", monto_worldtel_recaudado)
     
     with tab2:
         st.markdown("#### 👥 TIMMING ASESOR GASTOS")
         
-        # Selector de asesor para esta pestaña
-        asesores_worldtel = equipo_worldtel
-        asesor_seleccionado = st.selectbox(
-            "Selecciona un Asesor",
-            options=asesores_worldtel,
-            key="asesor_gastos"
-        )
-        
-        # Obtener recaudado del asesor seleccionado
-        monto_asesor = df[df['ASESOR'] == asesor_seleccionado]['MONTO'].sum()
-        
-        mostrar_tabla_timming(
-            tablas_timming.get('GASTOS_ASESOR'), 
-            "Gastos por Asesor",
-            monto_recaudado_worldtel=monto_asesor,
-            es_asesor=True,
-            nombre_asesor=asesor_seleccionado,
-            df_cierre=df
-        )
+        seccion_timming_asesores(version_datos, version_timming, equipo_worldtel, df,
+                                 timming_preparado.get('GASTOS_ASESOR'))
     
+elif es_historico:
+    st.info(f"ℹ️ El histórico no tiene datos de TIMMING para {periodo_elegido}.")
 else:
     st.warning("⚠️ No se pudo cargar el archivo de TIMMING. Verifica que el archivo existe en la ruta correcta.")
\ No newline at end of file
@@ -0,0 +1,134 @@
+import json
+import pandas as pd
+
+def normalizar_nombre(nombre):
+    """Clave de búsqueda de un nombre: sin espacios repetidos y sin distinguir mayúsculas"""
+    return ' '.join(str(nombre).split()).casefold()
+
+def _fecha_o_none(valor):
+    return pd.Timestamp(valor) if valor else None
+
+def cargar_registro(ruta):
+    """Carga el registro de equipos desde un JSON y lo compila en tablas hash.
+
+    Formato del archivo:
+        {
+            "equipo_por_defecto": "GI CORONADO",
+            "equipos": {
+                "WORLDTEL": [
+                    {"nombre": "Nombre Completo", "alias": ["Otro Nombre"],
+                     "desde": "2025-11-01", "hasta": "2025-12-31"}
+                ]
+            }
+        }
+
+    `alias`, `desde` y `hasta` son opcionales; sin fechas la membresía no
+    vence. Quien no figure en ningún equipo pertenece a `equipo_por_defecto`.
+    """
+    with open(ruta, encoding='utf-8') as archivo:
+        config = json.load(archivo)
+
+    por_defecto = config['equipo_por_defecto']
+    vigencias = {}   # clave del nombre canónico -> [(desde, hasta, equipo), ...]
+    nombres = {}     # clave (nombre o alias) -> nombre canónico
+    miembros = {}    # equipo -> [(nombre, desde, hasta), ...] en el orden del archivo
+
+    for equipo, integrantes in config['equipos'].items():
+        miembros[equipo] = []
+        for integrante in integrantes:
+            nombre = integrante['nombre']
+            desde = _fecha_o_none(integrante.get('desde'))
+            hasta = _fecha_o_none(integrante.get('hasta'))
+            miembros[equipo].append((nombre, desde, hasta))
+            for variante in [nombre] + integrante.get('alias', []):
+                clave = normalizar_nombre(variante)
+                if nombres.setdefault(clave, nombre) != nombre:
+                    raise ValueError(f"'{variante}' está asignado a '{nombres[clave]}' y a '{nombre}'")
+            # Las membresías van bajo el nombre canónico: un alias usa todas las
+            # de su integrante, no solo la de la entrada donde aparece
+            vigencias.setdefault(normalizar_nombre(nombre), []).append((desde, hasta, equipo))
+
+    # Las claves con una sola membresía sin fechas se resuelven con un dict plano;
+    # el resto necesita la fecha de cada fila
+    fijos = {clave: periodos[0][2] for clave, periodos in vigencias.items()
+             if len(periodos) == 1 and periodos[0][0] is None and periodos[0][1] is None}
+    con_vigencia = {clave: sorted(periodos, key=lambda p: p[0] or pd.Timestamp.min)
+                    for clave, periodos in vigencias.items() if clave not in fijos}
+
+    return {
+        'por_defecto': por_defecto,
+        'equipos': sorted(set(miembros) | {por_defecto}),
+        'fijos': fijos,
+        'con_vigencia': con_vigencia,
+        'miembros': miembros,
+        'canonicos': nombres
+    }
+
+def tipo_equipo(registro):
+    """Dtype categórico de EQUIPO, con los equipos en orden alfabético"""
+    return pd.CategoricalDtype(registro['equipos'])
+
+def clasificar(nombres, registro, fechas=None):
+    """Asigna el equipo de cada fila.
+
+    La normalización y la búsqueda se hacen una vez por nombre distinto y se
+    propagan con map, así que el costo por fila es una consulta hash. Los
+    nombres con membresía por fechas se resuelven con `fechas` (Series
+    alineada con `nombres`, se compara solo el día); sin fecha se usa su
+    membresía más reciente. Los alias se buscan por su nombre canónico.
+    """
+    if fechas is not None:
+        fechas = pd.to_datetime(fechas, errors='coerce').dt.normalize()
+    canonicos = registro['canonicos']
+    claves = {}
+    for nombre in pd.unique(nombres.dropna()):
+        clave = normalizar_nombre(nombre)
+        claves[nombre] = normalizar_nombre(canonicos.get(clave, clave))
+    equipo_fijo = {nombre: registro['fijos'][clave] for nombre, clave in claves.items()
+                   if clave in registro['fijos']}
+    equipos = nombres.map(equipo_fijo).astype(object)
+
+    for nombre, clave in claves.items():
+        periodos = registro['con_vigencia'].get(clave)
+        if not periodos:
+            continue
+        filas = nombres == nombre
+        if fechas is None:
+            equipos[filas] = periodos[-1][2]
+            continue
+        equipos[filas & fechas.isna()] = periodos[-1][2]
+        for desde, hasta, equipo in periodos:
+            en_periodo = filas & fechas.notna()
+            if desde is not None:
+                en_periodo &= fechas >= desde
+            if hasta is not None:
+                en_periodo &= fechas <= hasta
+            equipos[en_periodo] = equipo
+
+    return equipos.fillna(registro['por_defecto']).astype(tipo_equipo(registro))
+
+def nombres_canonicos(nombres, registro):
+    """Reemplaza los alias del registro por su nombre canónico (p. ej. los nombres
+    cortos de las exportaciones por hoja); los demás nombres quedan igual"""
+    cambios = {}
+    for nombre in pd.unique(nombres.dropna()):
+        canonico = registro['canonicos'].get(normalizar_nombre(nombre), nombre)
+        if canonico != nombre:
+            cambios[nombre] = canonico
+    if not cambios:
+        return nombres
+    if isinstance(nombres.dtype, pd.CategoricalDtype):
+        return nombres.astype(object).replace(cambios).astype('category')
+    return nombres.replace(cambios)
+
+def miembros(registro, equipo, fecha=None):
+    """Nombres canónicos de un equipo (vigentes en `fecha` si se indica), en el orden del archivo"""
+    if fecha is not None:
+        fecha = pd.Timestamp(fecha).normalize()
+    resultado = []
+    for nombre, desde, hasta in registro['miembros'].get(equipo, []):
+        if fecha is not None and ((desde is not None and fecha < desde) or (hasta is not None and fecha > hasta)):
+            continue
+        if nombre not in resultado:
+            resultado.append(nombre)
+    return resultado
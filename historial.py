@@ -0,0 +1,183 @@
+"""Histórico mensual del dashboard en un archivo SQLite.
+
+Cada vez que se carga un libro se guarda su periodo (mes 'AAAA-MM'):
+pagos, gestiones y tablas de timming. Un periodo se reemplaza completo al
+volver a guardarlo, así que recargar el libro del mes en curso lo actualiza
+sin duplicar filas. Los periodos guardados se consultan sin abrir Excel.
+"""
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from carga import ESQUEMAS_ANALISIS, normalizar_tipos
+
+COLUMNAS_PAGOS = ['ASESOR', 'EQUIPO', 'CARTERA', 'RAZON_SOCIAL', 'FECHA_DE_PAGO', 'MONTO', 'NUMERO_FACTURA']
+COLUMNAS_GESTIONES = ['GESTOR', 'EQUIPO', 'FECHA_GESTION', 'FECHA_PROMESA', 'MONTO_PROMESA']
+COLUMNAS_TIMMING = ['TABLA', 'Día hábil', 'Fecha', 'Timing', 'Meta día', 'Acumulado']
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cargas (
+    periodo TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    origen TEXT,
+    cargado_ns INTEGER NOT NULL,
+    filas INTEGER NOT NULL,
+    PRIMARY KEY (periodo, tipo)
+);
+CREATE TABLE IF NOT EXISTS pagos (
+    periodo TEXT NOT NULL,
+    ASESOR TEXT, EQUIPO TEXT, CARTERA TEXT, RAZON_SOCIAL TEXT,
+    FECHA_DE_PAGO TIMESTAMP, MONTO REAL, NUMERO_FACTURA TEXT
+);
+CREATE INDEX IF NOT EXISTS pagos_periodo_fecha ON pagos (periodo, FECHA_DE_PAGO);
+CREATE INDEX IF NOT EXISTS pagos_periodo_equipo ON pagos (periodo, EQUIPO);
+CREATE INDEX IF NOT EXISTS pagos_periodo_asesor ON pagos (periodo, ASESOR);
+CREATE TABLE IF NOT EXISTS gestiones (
+    periodo TEXT NOT NULL,
+    GESTOR TEXT, EQUIPO TEXT,
+    FECHA_GESTION TIMESTAMP, FECHA_PROMESA TIMESTAMP, MONTO_PROMESA REAL
+);
+CREATE INDEX IF NOT EXISTS gestiones_periodo_fecha ON gestiones (periodo, FECHA_GESTION);
+CREATE INDEX IF NOT EXISTS gestiones_periodo_equipo ON gestiones (periodo, EQUIPO);
+CREATE INDEX IF NOT EXISTS gestiones_periodo_gestor ON gestiones (periodo, GESTOR);
+CREATE TABLE IF NOT EXISTS timming (
+    periodo TEXT NOT NULL,
+    TABLA TEXT NOT NULL,
+    "Día hábil" REAL, Fecha TIMESTAMP, Timing REAL, "Meta día" REAL, Acumulado REAL
+);
+CREATE INDEX IF NOT EXISTS timming_periodo ON timming (periodo, TABLA);
+"""
+
+def conectar(ruta):
+    """Abre (y crea si hace falta) el histórico"""
+    conexion = sqlite3.connect(ruta)
+    conexion.executescript(ESQUEMA)
+    return conexion
+
+def periodo_dominante(fechas):
+    """Mes ('AAAA-MM') con más fechas; None si no hay fechas válidas"""
+    meses = pd.to_datetime(fechas, errors='coerce').dropna().dt.strftime('%Y-%m')
+    return meses.value_counts().idxmax() if len(meses) else None
+
+def _para_sqlite(df, columnas):
+    """Columnas a guardar, con categorías como texto y fechas como datetime"""
+    datos = df.reindex(columns=columnas)
+    for col in columnas:
+        if isinstance(datos[col].dtype, pd.CategoricalDtype):
+            datos[col] = datos[col].astype(object)
+    if 'NUMERO_FACTURA' in datos:
+        datos['NUMERO_FACTURA'] = datos['NUMERO_FACTURA'].map(str, na_action='ignore')
+    return datos
+
+def _filas(datos):
+    """Filas como tuplas que acepta sqlite3: fechas como texto (igual que to_sql) y nulos como None"""
+    columnas = []
+    for col in datos.columns:
+        serie = datos[col]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            serie = serie.dt.strftime('%Y-%m-%d %H:%M:%S')
+        columnas.append(serie.astype(object).where(serie.notna(), None))
+    return zip(*columnas)
+
+def _reemplazar(conexion, tabla, tipo, periodo, datos, origen):
+    # Sin to_sql: hace commit por su cuenta y el reemplazo dejaría de ser atómico
+    datos = datos.assign(periodo=periodo)
+    columnas = ', '.join(f'"{col}"' for col in datos.columns)
+    marcas = ', '.join('?' * len(datos.columns))
+    conexion.execute(f"DELETE FROM {tabla} WHERE periodo = ?", (periodo,))
+    conexion.executemany(f"INSERT INTO {tabla} ({columnas}) VALUES ({marcas})", _filas(datos))
+    conexion.execute(
+        "INSERT OR REPLACE INTO cargas (periodo, tipo, origen, cargado_ns, filas) VALUES (?, ?, ?, ?, ?)",
+        (periodo, tipo, origen and os.path.abspath(origen), time.time_ns(), len(datos))
+    )
+
+def guardar_periodo(ruta, periodo, pagos, gestiones=None, origen=None, origen_gestiones=None):
+    """Guarda (reemplazando) los pagos y gestiones de un periodo en una transacción.
+    `origen_gestiones` es el archivo de las gestiones si no es el mismo `origen`"""
+    with closing(conectar(ruta)) as conexion, conexion:
+        _reemplazar(conexion, 'pagos', 'pagos', periodo, _para_sqlite(pagos, COLUMNAS_PAGOS), origen)
+        if gestiones is not None:
+            _reemplazar(conexion, 'gestiones', 'gestiones', periodo,
+                        _para_sqlite(gestiones, COLUMNAS_GESTIONES), origen_gestiones or origen)
+
+def guardar_timming(ruta, periodo, tablas, origen=None):
+    """Guarda (reemplazando) las tablas de timming de un periodo ({nombre: DataFrame})
+    en una transacción"""
+    datos = pd.concat(
+        [tabla.assign(TABLA=nombre) for nombre, tabla in tablas.items() if tabla is not None],
+        ignore_index=True
+    )
+    datos = datos.reindex(columns=COLUMNAS_TIMMING)
+    datos['Fecha'] = pd.to_datetime(datos['Fecha'], errors='coerce')
+    for col in ['Día hábil', 'Timing', 'Meta día', 'Acumulado']:
+        datos[col] = pd.to_numeric(datos[col], errors='coerce')
+    with closing(conectar(ruta)) as conexion, conexion:
+        _reemplazar(conexion, 'timming', 'timming', periodo, datos, origen)
+
+def periodos(ruta):
+    """Periodos con pagos guardados, del más reciente al más antiguo"""
+    with closing(conectar(ruta)) as conexion:
+        filas = conexion.execute(
+            "SELECT periodo FROM cargas WHERE tipo = 'pagos' ORDER BY periodo DESC"
+        ).fetchall()
+    return [periodo for (periodo,) in filas]
+
+def version_historial(ruta):
+    """Cambia con cada guardado: (cargas registradas, última carga en ns)"""
+    with closing(conectar(ruta)) as conexion:
+        return tuple(conexion.execute("SELECT COUNT(*), MAX(cargado_ns) FROM cargas").fetchone())
+
+def version_periodo(ruta, periodo, tipo='pagos'):
+    """Identifica la última carga de un tipo ('pagos', 'gestiones' o 'timming')
+    de un periodo: (ruta#periodo, cargado_ns, filas)"""
+    with closing(conectar(ruta)) as conexion:
+        fila = conexion.execute(
+            "SELECT cargado_ns, filas FROM cargas WHERE periodo = ? AND tipo = ?", (periodo, tipo)
+        ).fetchone()
+    return (f"{ruta}#{periodo}",) + (tuple(fila) if fila else (None, None))
+
+def leer_periodo(ruta, periodo):
+    """(pagos, gestiones) de un periodo con los tipos de ESQUEMAS_ANALISIS;
+    gestiones es None si el periodo no tiene"""
+    with closing(conectar(ruta)) as conexion:
+        pagos = pd.read_sql(
+            "SELECT * FROM pagos WHERE periodo = ?", conexion, params=(periodo,), parse_dates=['FECHA_DE_PAGO']
+        )
+        gestiones = pd.read_sql(
+            "SELECT * FROM gestiones WHERE periodo = ?", conexion, params=(periodo,),
+            parse_dates=['FECHA_GESTION', 'FECHA_PROMESA']
+        )
+    pagos = normalizar_tipos(pagos.drop(columns='periodo'), ESQUEMAS_ANALISIS['CIERRE DE PAGOS'])
+    if gestiones.empty:
+        return pagos, None
+    return pagos, normalizar_tipos(gestiones.drop(columns='periodo'), ESQUEMAS_ANALISIS['GESTIONES'])
+
+def leer_timming(ruta, periodo):
+    """Tablas de timming de un periodo ({nombre: DataFrame}); None si no hay"""
+    with closing(conectar(ruta)) as conexion:
+        datos = pd.read_sql(
+            "SELECT * FROM timming WHERE periodo = ?", conexion, params=(periodo,), parse_dates=['Fecha']
+        )
+    if datos.empty:
+        return None
+    return {nombre: tabla.drop(columns=['periodo', 'TABLA']).reset_index(drop=True)
+            for nombre, tabla in datos.groupby('TABLA', sort=False)}
+
+def resumen_mensual(ruta):
+    """Monto, pagos y clientes distintos por periodo y equipo (sin ASESOR nulo ni ESTUDIO)"""
+    with closing(conectar(ruta)) as conexion:
+        return pd.read_sql(
+            """
+            SELECT periodo AS PERIODO, EQUIPO,
+                   SUM(MONTO) AS MONTO, COUNT(MONTO) AS PAGOS,
+                   COUNT(DISTINCT RAZON_SOCIAL) AS CLIENTES
+            FROM pagos
+            WHERE ASESOR IS NOT NULL AND ASESOR <> 'ESTUDIO'
+            GROUP BY periodo, EQUIPO
+            ORDER BY periodo, EQUIPO
+            """,
+            conexion
+        )
@@ -0,0 +1,87 @@
+"""Tablas HTML del dashboard a partir de DataFrames.
+
+Las celdas se arman columna por columna con concatenación vectorizada de
+strings y las filas se unen con str.join, sin iterrows ni `+=` por celda.
+"""
+import pandas as pd
+
+BORDE = 'border: 1px solid #ddd;'
+
+# Estilo de fila por clase (ver `clases_fila` en tabla_html)
+ESTILOS_FILA = {
+    'normal': 'background-color: #ffffff; font-weight: normal;',
+    'cabecera': 'background-color: #fff3cd; font-weight: bold;',
+    'resaltado': 'background-color: #fffacd; font-weight: bold;',
+    'total': 'background-color: #e8f4f8; font-weight: bold;',
+    'worldtel': 'background-color: #e3f2fd;',
+    'gi': 'background-color: #fff3e0;'
+}
+
+def formato_numero(serie, prefijo='', decimales=2, vacio='-'):
+    """'{prefijo}1,234.56' para cada valor de la serie; los nulos se muestran como `vacio`"""
+    plantilla = f"{prefijo}{{:,.{decimales}f}}"
+    return serie.map(plantilla.format, na_action='ignore').fillna(vacio).astype(object)
+
+def formato_moneda(serie, vacio='-'):
+    """Montos con el formato 'S/ 1,234.56'"""
+    return formato_numero(serie, prefijo='S/ ', vacio=vacio)
+
+def formato_porcentaje(serie, vacio='-'):
+    """Fracciones (0.125) como '12.50%'"""
+    texto = formato_numero(serie * 100, vacio=vacio)
+    return texto.mask(serie.notna(), texto + '%')
+
+def _celdas(valores, etiqueta, estilo, negrita):
+    apertura = f"<{etiqueta} style='{estilo}'>" + ('<strong>' if negrita else '')
+    cierre = ('</strong>' if negrita else '') + f"</{etiqueta}>"
+    # Las celdas sin valor quedan vacías
+    return apertura + valores.astype(object).fillna('').astype(str) + cierre
+
+def tabla_html(df, columnas=None, alineacion=None, clases_fila=None, negrita=(), alinear_encabezado=None,
+               relleno='8px', relleno_encabezado=None, estilo_tabla='width:100%; border-collapse: collapse;',
+               estilo_encabezado='background-color: #e8e8e8; font-weight: bold;',
+               estilos_fila=ESTILOS_FILA, contenedor=None):
+    """Arma una tabla HTML con los valores de `df` ya formateados.
+
+    Args:
+        df: DataFrame con una fila por fila de la tabla
+        columnas: lista de columnas o dict columna -> título (por defecto todas)
+        alineacion: dict columna -> 'left' / 'center' / 'right'
+        clases_fila: Series alineada con df con la clase de cada fila
+            (clave de `estilos_fila`); sin ella las filas no llevan estilo
+        negrita: columnas cuyo contenido va en <strong>
+        alinear_encabezado: alineación común de los títulos (por defecto la de su columna)
+        contenedor: estilo de un <div> que envuelve la tabla (p. ej. scroll horizontal)
+    """
+    if columnas is None:
+        columnas = list(df.columns)
+    if not isinstance(columnas, dict):
+        columnas = {col: col for col in columnas}
+    alineacion = alineacion or {}
+    relleno_encabezado = relleno_encabezado or relleno
+
+    encabezados = ''.join(
+        f"<th style='padding: {relleno_encabezado}; {BORDE} text-align: {alinear_encabezado or alineacion.get(col, 'left')};'>{titulo}</th>"
+        for col, titulo in columnas.items()
+    )
+    partes = [f"<table style='{estilo_tabla}'>", f"<tr style='{estilo_encabezado}'>{encabezados}</tr>"]
+
+    if len(df):
+        filas = pd.Series('', index=df.index, dtype=object)
+        for col in columnas:
+            estilo = f"padding: {relleno}; {BORDE}"
+            if col in alineacion:
+                estilo += f" text-align: {alineacion[col]};"
+            filas = filas + _celdas(df[col], 'td', estilo, col in negrita)
+
+        if clases_fila is None:
+            aperturas = '<tr>'
+        else:
+            aperturas = clases_fila.map(lambda clase: f"<tr style='{estilos_fila[clase]}'>").astype(object)
+        partes.extend((aperturas + filas + '</tr>').tolist())
+
+    partes.append('</table>')
+    html = '\n'.join(partes)
+    if contenedor:
+        html = f"<div style='{contenedor}'>{html}</div>"
+    return html
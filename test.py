@@ -16,19 +16,11 @@ try:
     df = pd.read_excel(ruta, sheet_name='CIERRE DE PAGOS', engine='openpyxl')
     print("Datos cargados correctamente")
     
-    equipo_worldtel = [
-        'Laura Villanueva Solayo',
-        'Cherry Nathalia Matson Zambrano',
-        'Sandra Maria Benavides Vela',
-        'Carmen Dora Niño Ordinola',
-        'Daniel Alejandro Barrios Pavon',
-        'Juan Jose Felix Ventura',
-        'Rosa Elena Villarreal Pelaez',
-        'Carla del Rosario Castillo Alvarez',
-        'Lesly Dayanne Zarate Roman'
-    ]
-    
-    df['EQUIPO'] = df['ASESOR'].apply(lambda x: 'WORLDTEL' if x in equipo_worldtel else 'GI CORONADO')
+    import equipos
+    registro_equipos = equipos.cargar_registro("equipos.json")
+    print("Registro de equipos cargado")
+    
+    df['EQUIPO'] = equipos.clasificar(df['ASESOR'], registro_equipos, df['FECHA_DE_PAGO'])
     df = df[df['ASESOR'].notna() & (df['ASESOR'] != 'ESTUDIO')].copy()
     print("Equipos clasificados")
     